@@ -32,49 +32,339 @@
 from fastapi import FastAPI, Request
 from typing import Dict
 from fastapi.responses import JSONResponse
+from agents.exposure_engine import compute_exposure, compute_breakdown
+from agents.taxonomy import TaxonomyHolder
+from agents.risk_engine import RiskModel, correlation
+from common.instrumentation import instrument, stage, registry
+from data_ingestion.market_data_loader import store as price_store, sync_ticker, sync_tickers, SYNC_INTERVAL
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import pandas as pd
+import numpy as np
+import threading
+import asyncio
 import logging
+import time
+import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument(app, "analysis")
+
+INSTRUMENT_MASTER_PATH = os.getenv(
+    "INSTRUMENT_MASTER_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data_ingestion", "instrument_master.csv"))
+)
+
+# Instrument master compiled into an in-memory index at startup
+taxonomy = TaxonomyHolder(INSTRUMENT_MASTER_PATH)
+try:
+    taxonomy.reload()
+    logger.info(f"Loaded instrument taxonomy: {taxonomy.current.stats()}")
+except Exception as e:
+    logger.error(f"Error loading instrument taxonomy: {e}")
+
+
+RISK_BENCHMARK = os.getenv("RISK_BENCHMARK", "SPY")
+RISK_LOOKBACK_DAYS = int(os.getenv("RISK_LOOKBACK_DAYS", "252"))
+RISK_CONFIDENCES = [0.95, 0.99]
+# Rolling covariance state per (universe, benchmark, lookback), least recently used first
+RISK_MODEL_ENTRIES = int(os.getenv("RISK_MODEL_ENTRIES", "8"))
+risk_models = OrderedDict()
+risk_lock = threading.Lock()
+risk_stats = {"requests": 0, "builds": 0, "incremental_updates": 0, "days_added": 0, "current": 0,
+              "background_syncs": 0, "sync_errors": 0}
+registry.register_stats("analysis_risk", lambda: dict(risk_stats))
+
+# Requests read the store as it is; stale tickers are synced from upstream on
+# this one thread, at most once per sync interval each
+sync_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ohlcv-sync")
+sync_scheduled = {}
+sync_lock = threading.Lock()
+
+
+def holdings_from(data: dict):
+    """Names, values, funds and whether to include details, from a dict or columnar payload"""
+    # Columnar payload for large books: parallel arrays instead of a dict
+    if "names" in data:
+        return data.get("names", []), data.get("values", []), data.get("funds"), data.get("include_details", False)
+    portfolio: Dict[str, float] = data.get("portfolio", {})
+    return list(portfolio.keys()), list(portfolio.values()), None, True
+
+def exposure_report(data: dict) -> dict:
+    """Asia tech exposure for a {name: value} portfolio or columnar names/values(/funds) arrays"""
+    names, values, funds, include_details = holdings_from(data)
+
+    if not names:
+        return {
+            "exposure": "0.00% - No portfolio data provided",
+            "details": {}
+        }
+
+    # Look for Asia tech exposure
+    with stage("exposure"):
+        result = compute_exposure(names, values, funds, taxonomy.current)
+
+    response_data = {
+        "exposure": f"{result['percent_exposure']:.2f}% of your portfolio is exposed to Asia tech stocks.",
+        "total_exposure_value": result["total_exposure"],
+        "total_portfolio_value": result["total_value"],
+        "exposed_holdings": result["exposed_count"],
+        "total_holdings": result["holding_count"]
+    }
+    if include_details:
+        response_data["details"] = {
+            name: value for name, value, hit in zip(names, values, result["mask"]) if hit
+        }
+    if "funds" in result:
+        response_data["funds"] = result["funds"]
+
+    logger.info(f"Calculated exposure: {response_data['exposure']} ({result['holding_count']} holdings)")
+    return response_data
 
 @app.post("/risk_exposure")
 async def calculate_exposure(request: Request):
     try:
         data = await request.json()
-        portfolio: Dict[str, float] = data.get("portfolio", {})
-        
-        if not portfolio:
-            return JSONResponse(content={
-                "exposure": "0.00% - No portfolio data provided",
-                "details": {}
-            })
-
-        # Look for Asia tech exposure
-        exposure_report = {}
-        for asset, value in portfolio.items():
-            if any(term in asset.lower() for term in ["asia", "tsmc", "samsung", "taiwan", "korea", "china"]):
-                exposure_report[asset] = value
-
-        total_exposure = sum(exposure_report.values())
-        total_value = sum(portfolio.values())
-        percent_exposure = (total_exposure / total_value) * 100 if total_value > 0 else 0
-
-        response_data = {
-            "exposure": f"{percent_exposure:.2f}% of your portfolio is exposed to Asia tech stocks.",
-            "details": exposure_report,
-            "total_exposure_value": total_exposure,
-            "total_portfolio_value": total_value
-        }
-        
-        logger.info(f"Calculated exposure: {response_data}")
-        return JSONResponse(content=response_data)
+        return JSONResponse(content=exposure_report(data))
 
     except Exception as e:
         logger.error(f"Error in calculate_exposure: {str(e)}")
         return JSONResponse(
             content={"error": f"Analysis error: {str(e)}"}, 
             status_code=400
-        )
\ No newline at end of file
+        )
+
+@app.post("/exposure_breakdown")
+async def exposure_breakdown(request: Request):
+    """Exposure grouped by taxonomy dimensions, e.g. {"dimensions": ["region", "sector"]}"""
+    try:
+        data = await request.json()
+        names, values, _, _ = holdings_from(data)
+        dimensions = data.get("dimensions", ["region", "sector"])
+        return JSONResponse(content=compute_breakdown(names, values, taxonomy.current, dimensions))
+
+    except Exception as e:
+        logger.error(f"Error in exposure_breakdown: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Analysis error: {str(e)}"},
+            status_code=400
+        )
+
+@app.post("/taxonomy/reload")
+async def reload_taxonomy(request: Request):
+    """Rebuild the instrument index from disk and swap it in without a restart.
+    An optional "path" must name a file in the instrument master's directory"""
+    try:
+        data = await request.json() if await request.body() else {}
+        loaded = taxonomy.reload(data.get("path"))
+        logger.info(f"Reloaded instrument taxonomy: {loaded.stats()}")
+        return JSONResponse(content={"status": "reloaded", **loaded.stats()})
+
+    except PermissionError as e:
+        logger.error(f"Rejected taxonomy reload: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Taxonomy reload failed: {str(e)}"},
+            status_code=403
+        )
+    except Exception as e:
+        logger.error(f"Error reloading taxonomy: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Taxonomy reload failed: {str(e)}"},
+            status_code=400
+        )
+
+@app.get("/taxonomy")
+def taxonomy_stats():
+    return taxonomy.current.stats()
+
+
+def positions_from(data: dict):
+    """Distinct upper-cased tickers (sorted) and their summed position values"""
+    names, values, _, _ = holdings_from(data)
+    if len(names) != len(values):
+        raise ValueError(f"names and values differ in length ({len(names)} vs {len(values)})")
+    tickers, inverse = np.unique([str(name).upper() for name in names], return_inverse=True)
+    return [str(ticker) for ticker in tickers], np.bincount(inverse, weights=np.asarray(values, dtype=np.float64), minlength=len(tickers))
+
+
+def risk_model_for(tickers: list, benchmark: str, lookback: int):
+    """Cached RiskModel for the universe, advanced to the latest stored bar; returns (model, update)"""
+    if benchmark and not price_store.rows(benchmark):
+        benchmark = None
+
+    key = (tuple(tickers), benchmark, lookback)
+    with risk_lock:
+        model = risk_models.get(key)
+        start = pd.Timestamp(model.next_start_ns(), unit="ns", tz="UTC") if model is not None else None
+
+    # Store reads (and a new model's build) happen outside the lock, so one
+    # universe's I/O never stalls requests for the others
+    if model is None:
+        model = RiskModel(tickers, benchmark, lookback)
+        # Calendar span comfortably covering lookback + 1 trading days
+        start = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=int(lookback * 1.5) + 10)
+        model.build(price_store.read_many(model.columns, start=start, columns=["close"]))
+        update = "built"
+    else:
+        new_bars = {
+            ticker: {column: np.array(values) for column, values in bars.items()}
+            for ticker, bars in price_store.read_many(model.columns, start=start, columns=["close"]).items()
+        }
+        update = None
+
+    with risk_lock:
+        if update == "built":
+            risk_stats["builds"] += 1
+        else:
+            # advance skips days already folded in by a concurrent request
+            added = model.advance(new_bars)
+            update = "incremental" if added else "current"
+            risk_stats["incremental_updates" if added else "current"] += 1
+            risk_stats["days_added"] += added
+        risk_models[key] = model
+        risk_models.move_to_end(key)
+        while len(risk_models) > RISK_MODEL_ENTRIES:
+            risk_models.popitem(last=False)
+        return model, update
+
+
+def sync_in_background(tickers: list):
+    for ticker in tickers:
+        try:
+            sync_ticker(ticker)
+            outcome = "background_syncs"
+        except Exception as e:
+            outcome = "sync_errors"
+            logger.error(f"Error syncing {ticker}: {e}")
+        with risk_lock:
+            risk_stats[outcome] += 1
+
+
+def schedule_sync(tickers: list):
+    """Queue tickers not scheduled within the sync interval for a background sync"""
+    now = time.monotonic()
+    interval = SYNC_INTERVAL.total_seconds()
+    with sync_lock:
+        due = [ticker for ticker in tickers if now - sync_scheduled.get(ticker, -interval) >= interval]
+        sync_scheduled.update((ticker, now) for ticker in due)
+    if due:
+        sync_pool.submit(sync_in_background, due)
+
+
+def risk_universe(data: dict, benchmark: str):
+    """Tickers with stored history, their values, and the ones without history.
+
+    Answers from the store as it stands and syncs stale tickers in the
+    background; only tickers never fetched before are synced on the request.
+    With refresh, new bars for every ticker are fetched before answering.
+    """
+    tickers, values = positions_from(data)
+    universe = tickers + ([benchmark] if benchmark else [])
+    if data.get("refresh", False):
+        sync_tickers(universe)
+    else:
+        cold = [ticker for ticker in universe if price_store.synced_at(ticker) is None and not price_store.rows(ticker)]
+        if cold:
+            sync_tickers(cold)
+        schedule_sync(universe)
+    known = np.array([price_store.rows(ticker) > 0 for ticker in tickers], dtype=bool)
+    missing = [ticker for ticker, ok in zip(tickers, known) if not ok]
+    return [ticker for ticker, ok in zip(tickers, known) if ok], values[known], missing
+
+def compute_risk_metrics(data: dict) -> dict:
+    start = time.perf_counter()
+    benchmark = data.get("benchmark", RISK_BENCHMARK)
+    tickers, values, missing = risk_universe(data, benchmark)
+    if not tickers:
+        return {"error": "No price history for any holding", "missing": missing}
+
+    lookback = int(data.get("lookback_days", RISK_LOOKBACK_DAYS))
+    confidences = [float(c) for c in data.get("confidence", RISK_CONFIDENCES)]
+    horizon_days = int(data.get("horizon_days", 1))
+
+    with stage("risk_model"):
+        model, update = risk_model_for(tickers, benchmark, lookback)
+    with stage("risk_metrics"), risk_lock:
+        risk_stats["requests"] += 1
+        metrics = model.metrics(values, confidences, horizon_days)
+        as_of = pd.Timestamp(model.last_day, unit="D").date().isoformat() if model.last_day is not None else None
+    return {
+        **metrics,
+        "as_of": as_of,
+        "horizon_days": horizon_days,
+        "holdings": len(tickers),
+        "missing": missing,
+        "update": update,
+        "compute_ms": (time.perf_counter() - start) * 1000
+    }
+
+def compute_covariance(data: dict) -> dict:
+    benchmark = data.get("benchmark", RISK_BENCHMARK)
+    tickers, _, missing = risk_universe(data, benchmark)
+    if not tickers:
+        return {"error": "No price history for any holding", "missing": missing}
+
+    lookback = int(data.get("lookback_days", RISK_LOOKBACK_DAYS))
+    model, update = risk_model_for(tickers, benchmark, lookback)
+    with risk_lock:
+        cov = model.covariance()
+        observations = len(model.window)
+    return {
+        "tickers": tickers,
+        "observations": observations,
+        "covariance": cov.tolist(),
+        "correlation": correlation(cov).tolist(),
+        "missing": missing,
+        "update": update
+    }
+
+@app.post("/risk_metrics")
+async def risk_metrics(request: Request):
+    """Historical and parametric VaR/CVaR, volatility and betas from stored daily closes.
+
+    Takes the same portfolio payloads as /risk_exposure (names are tickers), plus
+    optional benchmark, confidence list, lookback_days, horizon_days and refresh
+    (sync from upstream before answering instead of in the background).
+    """
+    try:
+        data = await request.json()
+        result = await asyncio.to_thread(compute_risk_metrics, data)
+        status_code = 400 if "error" in result else 200
+        if status_code == 200:
+            logger.info(f"Risk metrics for {result['holdings']} holdings ({result['update']}) in {result['compute_ms']:.0f} ms")
+        return JSONResponse(content=result, status_code=status_code)
+
+    except Exception as e:
+        logger.error(f"Error in risk_metrics: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Risk analysis error: {str(e)}"},
+            status_code=400
+        )
+
+@app.post("/risk_metrics/covariance")
+async def risk_covariance(request: Request):
+    """Daily return covariance and correlation matrices over the lookback window"""
+    try:
+        data = await request.json()
+        result = await asyncio.to_thread(compute_covariance, data)
+        return JSONResponse(content=result, status_code=400 if "error" in result else 200)
+
+    except Exception as e:
+        logger.error(f"Error in risk_covariance: {str(e)}")
+        return JSONResponse(
+            content={"error": f"Risk analysis error: {str(e)}"},
+            status_code=400
+        )
+
+@app.on_event("shutdown")
+def stop_syncing():
+    sync_pool.shutdown(wait=False, cancel_futures=True)
+
+@app.get("/risk_metrics/stats")
+def risk_metrics_stats():
+    with risk_lock:
+        return {**risk_stats, "models": len(risk_models), "max_models": RISK_MODEL_ENTRIES}
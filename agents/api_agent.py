@@ -28,11 +28,17 @@
 #     }
 
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import requests
 import yfinance as yf
+import pandas as pd
 import os
 from dotenv import load_dotenv
+from common.rate_limit import TokenBucket, RateLimited
+from common.reference_cache import ReferenceDataCache
+from common.instrumentation import instrument, stage, registry
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -40,8 +46,85 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 ALPHA_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
+ALPHA_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+ALPHA_MAX_WORKERS = int(os.getenv("ALPHA_VANTAGE_MAX_WORKERS", "4"))
+# Free tier allows 5 calls per minute
+ALPHA_CALLS_PER_MINUTE = float(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
 
 app = FastAPI()
+instrument(app, "api")
+
+# Pooled HTTP session and bounded pool for Alpha Vantage lookups
+session = requests.Session()
+session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=ALPHA_MAX_WORKERS))
+session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=ALPHA_MAX_WORKERS))
+alpha_pool = ThreadPoolExecutor(max_workers=ALPHA_MAX_WORKERS)
+
+
+def load_overview(ticker: str) -> dict:
+    """Sector and market cap straight from Alpha Vantage; raises on any failure.
+    Never waits for the rate limiter, so a throttled lookup does not hold a pool worker"""
+    if not rate_limiter.try_acquire():
+        raise RateLimited("Alpha Vantage rate limit reached", rate_limiter.wait_time())
+    res = session.get(
+        ALPHA_URL,
+        params={"function": "OVERVIEW", "symbol": ticker, "apikey": ALPHA_KEY},
+        timeout=10
+    )
+    res.raise_for_status()
+    alpha_data = res.json()
+    # Throttled responses come back as 200 with a "Note"/"Information" message
+    if "Note" in alpha_data or "Information" in alpha_data:
+        raise RuntimeError(alpha_data.get("Note") or alpha_data.get("Information"))
+    return {"sector": alpha_data.get("Sector"), "market_cap": alpha_data.get("MarketCapitalization")}
+
+
+rate_limiter = TokenBucket(ALPHA_CALLS_PER_MINUTE)
+overview_cache = ReferenceDataCache(
+    load_overview,
+    field_ttls={
+        "sector": float(os.getenv("SECTOR_TTL_SECONDS", str(7 * 24 * 3600))),
+        "market_cap": float(os.getenv("MARKET_CAP_TTL_SECONDS", str(24 * 3600))),
+    },
+    db_path=os.getenv("REFERENCE_CACHE_DB") or None,
+)
+registry.register_stats("api_reference_cache", overview_cache.stats)
+
+
+def fetch_overview(ticker: str) -> dict:
+    """Sector and market cap from the reference cache, or None values if unavailable"""
+    if not ALPHA_KEY:
+        return {"sector": None, "market_cap": None}
+    try:
+        return overview_cache.get(ticker.upper())
+    except Exception as e:
+        logger.warning(f"Alpha Vantage API error for {ticker}: {e}")
+        return {"sector": None, "market_cap": None}
+
+
+def download_history(tickers: list) -> pd.DataFrame:
+    """One bulk Yahoo Finance download for all tickers, columns keyed by (field, ticker)"""
+    return yf.download(tickers, period="1d", group_by="column", threads=True,
+                       progress=False, auto_adjust=False)
+
+
+def fetch_quotes(tickers: list) -> pd.DataFrame:
+    """Latest price and intraday change % for every ticker, computed column-wise"""
+    hist = download_history(tickers)
+    quotes = pd.DataFrame(index=pd.Index(tickers, name="ticker"),
+                          columns=["current_price", "change_pct"], dtype=float)
+    if hist is None or hist.empty:
+        return quotes
+
+    if not isinstance(hist.columns, pd.MultiIndex):
+        hist.columns = pd.MultiIndex.from_product([hist.columns, tickers[:1]])
+
+    close = hist["Close"].ffill().iloc[-1]
+    open_ = hist["Open"].ffill().iloc[-1]
+    quotes["current_price"] = close.reindex(tickers).astype(float)
+    quotes["change_pct"] = ((close - open_) / open_ * 100).reindex(tickers).astype(float)
+    return quotes
+
 
 @app.get("/market_data")
 def get_market_data(ticker: str = Query(...)):
@@ -60,25 +143,14 @@ def get_market_data(ticker: str = Query(...)):
                 change_pct = ((current_price - open_price) / open_price) * 100
 
         # Get Alpha Vantage data if API key is available
-        sector = None
-        market_cap = None
-        
-        if ALPHA_KEY:
-            try:
-                alpha_url = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={ticker}&apikey={ALPHA_KEY}"
-                res = requests.get(alpha_url, timeout=10)
-                alpha_data = res.json()
-                sector = alpha_data.get("Sector")
-                market_cap = alpha_data.get("MarketCapitalization")
-            except Exception as e:
-                logger.warning(f"Alpha Vantage API error: {e}")
+        overview = fetch_overview(ticker)
 
         return {
             "ticker": ticker,
             "current_price": current_price,
             "change_pct": change_pct,
-            "sector": sector,
-            "market_cap": market_cap
+            "sector": overview["sector"],
+            "market_cap": overview["market_cap"]
         }
         
     except Exception as e:
@@ -90,4 +162,52 @@ def get_market_data(ticker: str = Query(...)):
             "sector": None,
             "market_cap": None,
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+@app.post("/market_data/batch")
+async def get_market_data_batch(request: Request):
+    """Market data for many tickers: one bulk price download plus concurrent overview lookups"""
+    tickers = []
+    try:
+        data = await request.json()
+        tickers = list(dict.fromkeys(t.strip().upper() for t in data.get("tickers", []) if t.strip()))
+
+        if not tickers:
+            return {"results": {}}
+
+        # Start Alpha Vantage lookups first so they overlap the price download
+        loop = asyncio.get_running_loop()
+        overview_futures = [loop.run_in_executor(alpha_pool, fetch_overview, ticker) for ticker in tickers]
+
+        try:
+            with stage("quotes"):
+                quotes = await loop.run_in_executor(None, fetch_quotes, tickers)
+        except Exception as e:
+            logger.error(f"Bulk price download failed: {e}")
+            quotes = pd.DataFrame(index=tickers, columns=["current_price", "change_pct"], dtype=float)
+
+        # NaN -> None for JSON
+        quotes = quotes.astype(object).where(quotes.notna(), None)
+
+        with stage("overviews"):
+            overviews = await asyncio.gather(*overview_futures)
+
+        results = {}
+        for ticker, overview in zip(tickers, overviews):
+            results[ticker] = {
+                "ticker": ticker,
+                "current_price": quotes.at[ticker, "current_price"],
+                "change_pct": quotes.at[ticker, "change_pct"],
+                "sector": overview["sector"],
+                "market_cap": overview["market_cap"]
+            }
+
+        return {"results": results}
+
+    except Exception as e:
+        logger.error(f"Error getting batch market data: {e}")
+        return {"results": {}, "tickers": tickers, "error": str(e)}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return overview_cache.stats()
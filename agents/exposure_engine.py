@@ -0,0 +1,113 @@
+import re
+import numpy as np
+import pandas as pd
+
+ASIA_TECH_TERMS = ["asia", "tsmc", "samsung", "taiwan", "korea", "china"]
+
+# One compiled alternation instead of a substring scan per term
+ASIA_TECH_PATTERN = re.compile("|".join(map(re.escape, ASIA_TECH_TERMS)), re.IGNORECASE)
+
+
+def classify(names, taxonomy=None) -> np.ndarray:
+    """Boolean mask of Asia tech holdings.
+
+    Names found in the instrument taxonomy are classified by region and sector;
+    the rest fall back to the keyword pattern, matched once per distinct name.
+    """
+    search = ASIA_TECH_PATTERN.search
+    # Large books repeat the same names across funds, so match the distinct set
+    # and expand back with dictionary lookups
+    flags = {name: search(str(name)) is not None for name in set(names)}
+    mask = np.fromiter(map(flags.__getitem__, names), dtype=bool, count=len(names))
+
+    if taxonomy is not None and taxonomy.size:
+        rows = taxonomy.rows(names)
+        known = rows >= 0
+        mask = np.where(known, taxonomy_mask(taxonomy, rows, region="Asia", sector="Technology"), mask)
+    return mask
+
+
+def taxonomy_mask(taxonomy, rows: np.ndarray, **criteria) -> np.ndarray:
+    """Holdings whose instrument matches every dimension=label criterion"""
+    mask = rows >= 0
+    for dimension, label in criteria.items():
+        labels = taxonomy.labels[dimension]
+        if label not in labels:
+            return np.zeros(len(rows), dtype=bool)
+        mask &= taxonomy.dimension_codes(rows, dimension) == labels.index(label)
+    return mask
+
+
+def compute_breakdown(names, values, taxonomy, dimensions: list) -> dict:
+    """Exposure grouped by any combination of taxonomy dimensions (e.g. region x sector)"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(names) != len(values):
+        raise ValueError(f"names and values differ in length ({len(names)} vs {len(values)})")
+    unknown = [dimension for dimension in dimensions if dimension not in taxonomy.labels]
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {unknown}")
+
+    rows = taxonomy.rows(names)
+    codes = [taxonomy.dimension_codes(rows, dimension) for dimension in dimensions]
+    shape = tuple(len(taxonomy.labels[dimension]) for dimension in dimensions)
+
+    # One flat group id per holding, then a single weighted bincount
+    group_ids = np.ravel_multi_index(codes, shape) if dimensions else np.zeros(len(values), dtype=np.int64)
+    group_values = np.bincount(group_ids, weights=values, minlength=int(np.prod(shape)))
+    total_value = float(values.sum())
+
+    groups = []
+    for group_id in np.flatnonzero(group_values):
+        positions = np.unravel_index(group_id, shape)
+        group = {
+            dimension: taxonomy.labels[dimension][position]
+            for dimension, position in zip(dimensions, positions)
+        }
+        group["value"] = float(group_values[group_id])
+        group["percent"] = float(group_values[group_id] / total_value * 100) if total_value > 0 else 0
+        groups.append(group)
+    groups.sort(key=lambda group: group["value"], reverse=True)
+
+    return {
+        "dimensions": dimensions,
+        "groups": groups,
+        "total_value": total_value,
+        "unmatched_count": int((rows < 0).sum()),
+        "unmatched_value": float(values[rows < 0].sum())
+    }
+
+
+def compute_exposure(names, values, funds=None, taxonomy=None) -> dict:
+    """Aggregate exposure over parallel name/value (and optional fund) arrays"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(names) != len(values):
+        raise ValueError(f"names and values differ in length ({len(names)} vs {len(values)})")
+
+    mask = classify(names, taxonomy)
+    exposed_values = np.where(mask, values, 0.0)
+    total_value = float(values.sum())
+    total_exposure = float(exposed_values.sum())
+
+    result = {
+        "mask": mask,
+        "total_exposure": total_exposure,
+        "total_value": total_value,
+        "percent_exposure": (total_exposure / total_value) * 100 if total_value > 0 else 0,
+        "exposed_count": int(mask.sum()),
+        "holding_count": len(values)
+    }
+
+    if funds is not None:
+        fund_codes, fund_names = pd.factorize(np.asarray(funds, dtype=object))
+        fund_totals = np.bincount(fund_codes, weights=values, minlength=len(fund_names))
+        fund_exposures = np.bincount(fund_codes, weights=exposed_values, minlength=len(fund_names))
+        result["funds"] = {
+            name: {
+                "total_exposure": float(exposure),
+                "total_value": float(total),
+                "percent_exposure": float(exposure / total * 100) if total > 0 else 0
+            }
+            for name, exposure, total in zip(fund_names, fund_exposures, fund_totals)
+        }
+
+    return result
@@ -32,43 +32,65 @@
 
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from common.ttl_cache import TTLCache
+from common.sse import format_event
+from common.concurrency import InstrumentedExecutor, SingleFlight, StreamFlight
+from common.instrumentation import instrument, stage, registry
+import asyncio
+import hashlib
 import logging
+import re
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+MODEL_NAME = "gemini-1.5-pro"
 
 app = FastAPI()
+instrument(app, "language")
 
 # Configure Gemini only if API key is available
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel(model_name="gemini-1.5-pro")
+    model = genai.GenerativeModel(model_name=MODEL_NAME)
 else:
     model = None
     logger.warning("Gemini API key not found")
 
-@app.post("/generate_summary")
-async def generate_summary(request: Request):
-    try:
-        data = await request.json()
-        context = data.get("context", "")
-        question = data.get("question", "")
-        
-        if not model:
-            # Fallback response when Gemini is not available
-            return {
-                "summary": f"Based on the provided context: {context[:200]}... "
-                          f"Regarding your question about {question}, please check current market data sources "
-                          f"for real-time information about Asia tech stock exposure and earnings surprises."
-            }
-        
-        prompt = f"""
+summary_cache = TTLCache(
+    max_entries=int(os.getenv("SUMMARY_CACHE_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "900")),
+    db_path=os.getenv("SUMMARY_CACHE_DB") or None,
+)
+
+# Gemini calls block, so they run on a bounded pool instead of the event loop
+generation_pool = InstrumentedExecutor(int(os.getenv("LANGUAGE_MAX_IN_FLIGHT", "4")), name="gemini")
+single_flight = SingleFlight()
+stream_flight = StreamFlight()
+registry.register_stats("language_summary_cache", summary_cache.stats)
+registry.register_stats("language_generation", lambda: {**generation_pool.stats(), **single_flight.stats(), **stream_flight.stats()})
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def prompt_fingerprint(context: str, question: str, model_name: str = MODEL_NAME) -> str:
+    """Hash of the normalized request, so whitespace/case-only differences share an entry"""
+    normalized = "\0".join([
+        model_name,
+        _WHITESPACE.sub(" ", context).strip(),
+        _WHITESPACE.sub(" ", question).strip().casefold(),
+    ])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def build_prompt(context: str, question: str) -> str:
+    return f"""
         Context: {context}
         
         Question: {question}
@@ -77,12 +99,141 @@ async def generate_summary(request: Request):
         Focus on risk exposure and any earnings information mentioned.
         """
 
-        response = model.generate_content(prompt)
-        return {"summary": response.text}
 
+def fallback_summary(context: str, question: str) -> str:
+    # Fallback response when Gemini is not available
+    return (f"Based on the provided context: {context[:200]}... "
+            f"Regarding your question about {question}, please check current market data sources "
+            f"for real-time information about Asia tech stock exposure and earnings surprises.")
+
+
+ERROR_SUMMARY = ("Analysis unavailable due to technical error. "
+                 "Based on provided context, please review your Asia tech stock positions manually.")
+
+
+def generate_text(prompt: str) -> str:
+    return model.generate_content(prompt).text
+
+
+async def generate_and_cache(key: str, prompt: str) -> str:
+    summary = await generation_pool.run(generate_text, prompt)
+    summary_cache.set(key, summary)
+    return summary
+
+
+async def summarize(context: str, question: str, use_cache: bool = True) -> tuple:
+    """(summary, cache status, cache key); errors come back as ERROR_SUMMARY"""
+    try:
+        if not model:
+            return fallback_summary(context, question), "BYPASS", None
+
+        key = prompt_fingerprint(context, question)
+        if use_cache:
+            cached = summary_cache.get(key)
+            if cached is not None:
+                return cached, "HIT", key
+
+        # Identical prompts already being generated share that upstream call
+        shared = key in single_flight.in_flight
+        prompt = build_prompt(context, question)
+        with stage("generate"):
+            summary = await single_flight.do(key, lambda: generate_and_cache(key, prompt))
+        return summary, "COALESCED" if shared else "MISS", key
+
+    except Exception as e:
+        logger.error(f"Error in generate_summary: {e}")
+        return ERROR_SUMMARY, "BYPASS", None
+
+
+def cached_summary(context: str, question: str, use_cache: bool = True) -> tuple:
+    """(cache key, cached summary or None) for a streaming request"""
+    key = prompt_fingerprint(context, question)
+    return key, summary_cache.get(key) if model and use_cache else None
+
+
+def start_stream(key: str, prompt: str, broadcast):
+    """Drain the blocking Gemini stream on the bounded pool, publishing each chunk
+    on the event loop; runs to completion even if the first caller disconnects"""
+    loop = asyncio.get_running_loop()
+
+    def produce():
+        for chunk in model.generate_content(prompt, stream=True):
+            if chunk.text:
+                loop.call_soon_threadsafe(broadcast.publish, chunk.text)
+
+    def finished(producer: asyncio.Future):
+        error = producer.exception()
+        if error is None:
+            summary_cache.set(key, "".join(broadcast.chunks))
+        broadcast.finish(error)
+
+    asyncio.wrap_future(generation_pool.submit(produce)).add_done_callback(finished)
+
+
+async def summary_events(context: str, question: str, key: str, cached: str = None):
+    """(event, data) pairs: a "token" per chunk Gemini produces, then one "done" event"""
+    if not model:
+        text = fallback_summary(context, question)
+        yield "token", {"text": text}
+        yield "done", {"summary": text, "cache": "BYPASS"}
+        return
+    if cached is not None:
+        yield "token", {"text": cached}
+        yield "done", {"summary": cached, "cache": "HIT"}
+        return
+
+    # Identical prompts already streaming follow that stream from its first chunk
+    chunks, shared = stream_flight.follow(key, lambda broadcast: start_stream(key, build_prompt(context, question), broadcast))
+    parts = []
+    try:
+        async for text in chunks:
+            parts.append(text)
+            yield "token", {"text": text}
+    except Exception as e:
+        logger.error(f"Error in stream_summary: {e}")
+        if not parts:
+            yield "token", {"text": ERROR_SUMMARY}
+        yield "done", {"summary": "".join(parts) or ERROR_SUMMARY, "cache": "BYPASS"}
+        return
+
+    yield "done", {"summary": "".join(parts), "cache": "COALESCED" if shared else "MISS"}
+
+
+@app.post("/generate_summary")
+async def generate_summary(request: Request):
+    try:
+        data = await request.json()
     except Exception as e:
         logger.error(f"Error in generate_summary: {e}")
-        return {
-            "summary": f"Analysis unavailable due to technical error. "
-                      f"Based on provided context, please review your Asia tech stock positions manually."
-        }
\ No newline at end of file
+        return JSONResponse(content={"summary": ERROR_SUMMARY}, headers={"X-Cache": "BYPASS"})
+
+    summary, cache, key = await summarize(data.get("context", ""), data.get("question", ""), data.get("cache", True))
+    headers = {"X-Cache": cache}
+    if key:
+        headers["X-Cache-Key"] = key[:16]
+    return JSONResponse(content={"summary": summary}, headers=headers)
+
+@app.post("/generate_summary/stream")
+async def stream_summary(request: Request):
+    """Server-sent events: "token" events as Gemini produces text, then one "done" event"""
+    data = await request.json()
+    context = data.get("context", "")
+    question = data.get("question", "")
+    key, cached = cached_summary(context, question, data.get("cache", True))
+
+    async def events():
+        async for event, payload in summary_events(context, question, key, cached):
+            yield format_event(event, payload)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"X-Cache": "HIT" if cached is not None else
+                                      "COALESCED" if key in stream_flight.in_flight else "MISS"})
+
+@app.get("/cache/stats")
+def cache_stats():
+    return summary_cache.stats()
+
+@app.get("/generation/stats")
+def generation_stats():
+    """Executor queue depth and wait/run times plus coalescing counts, for sizing workers"""
+    return {**generation_pool.stats(), **single_flight.stats(), **stream_flight.stats()}
@@ -25,51 +25,553 @@
 from fastapi import FastAPI, Request
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from common.embedding_cache import CachedEmbeddings
+from common.sharded_index import ShardedIndex
+from common.instrumentation import instrument, stage, registry, readiness
+from collections import OrderedDict
+import numpy as np
+import threading
+import hashlib
 import logging
+import shutil
+import re
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INDEX_DIR = os.getenv("RETRIEVER_INDEX_DIR", "data/faiss_index")
+DEFAULT_COLLECTION = "default"
+# Total size of in-memory collections before cold ones are evicted
+MEMORY_BUDGET_BYTES = int(float(os.getenv("RETRIEVER_MEMORY_BUDGET_MB", "512")) * 1024 * 1024)
+# Evicted collections are snapshotted to disk so they reload without re-embedding
+SPILL_TO_DISK = os.getenv("RETRIEVER_SPILL_TO_DISK", "1") == "1"
+# Per-request collections (the orchestrator's brief-<hash>) are cheap to rebuild
+# and unbounded in number: evicting one drops it instead of writing a snapshot
+TRANSIENT_PREFIX = os.getenv("RETRIEVER_TRANSIENT_PREFIX", "brief-")
+# Bulk indexes built offline by data_ingestion.embeddings_indexer, one directory per collection
+SHARDED_DIR = os.getenv("RETRIEVER_SHARDED_DIR", "data/sharded_index")
+# Load the model at import instead of in the background after startup. The
+# retriever must run as one worker (collections live in process memory), so
+# there are no forked workers to share it with
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+
 app = FastAPI()
+instrument(app, "retriever")
 
-try:
-    embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-except Exception as e:
-    logger.error(f"Error loading embedding model: {e}")
-    embedding_model = None
+# Set by load_embedding_model; None until then, which endpoints report as unavailable
+embedding_model = None
+model_lock = threading.Lock()
+readiness.register("retriever.embedding_model")
 
-index = None
+# Named FAISS collections, least recently used first
+collections = OrderedDict()
+collections_lock = threading.RLock()
+
+# Read-only memory-mapped collections; they live in the page cache, outside the memory budget
+sharded = {}
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def collection_path(name: str) -> str:
+    return os.path.join(INDEX_DIR, name)
+
+
+def check_name(name: str) -> str:
+    if not COLLECTION_NAME.match(name or "") or name in (".", ".."):
+        raise ValueError(f"Invalid collection name: {name!r}")
+    return name
+
+
+def collection_bytes(store) -> int:
+    vectors = store.index.ntotal * store.index.d * 4
+    texts = sum(len(doc.page_content) for doc in store.docstore._dict.values())
+    return vectors + texts
+
+
+def total_vectors(store) -> int:
+    return store.index.ntotal if store is not None else 0
+
+
+def save_snapshot(name: str) -> bool:
+    with collections_lock:
+        store = collections.get(name)
+        if store is None:
+            return False
+        path = collection_path(check_name(name))
+        os.makedirs(path, exist_ok=True)
+        store.save_local(path)
+    logger.info(f"Collection {name} saved to {path} ({store.index.ntotal} vectors)")
+    return True
+
+
+def load_snapshot(name: str) -> bool:
+    # Snapshots are pickles, so only ever read them from under INDEX_DIR
+    path = collection_path(check_name(name))
+    if not embedding_model or not os.path.exists(os.path.join(path, "index.faiss")):
+        return False
+    store = FAISS.load_local(path, embedding_model, allow_dangerous_deserialization=True)
+    with collections_lock:
+        collections[name] = store
+        collections.move_to_end(name)
+        enforce_budget(keep=name)
+    logger.info(f"Collection {name} loaded from {path} ({store.index.ntotal} vectors)")
+    return True
+
+
+def is_transient(name: str) -> bool:
+    return bool(TRANSIENT_PREFIX) and name.startswith(TRANSIENT_PREFIX)
+
+
+def evict(name: str, spill: bool = SPILL_TO_DISK) -> bool:
+    with collections_lock:
+        if name not in collections:
+            return False
+        if spill and not is_transient(name):
+            save_snapshot(name)
+        del collections[name]
+    logger.info(f"Collection {name} evicted from memory")
+    return True
+
+
+def enforce_budget(keep: str = None):
+    """Evict least recently used collections until the memory budget is met"""
+    with collections_lock:
+        sizes = {name: collection_bytes(store) for name, store in collections.items()}
+        used = sum(sizes.values())
+        for name in list(collections.keys()):
+            if used <= MEMORY_BUDGET_BYTES:
+                break
+            if name == keep:
+                continue
+            evict(name)
+            used -= sizes[name]
+
+
+def get_collection(name: str):
+    """Return an in-memory collection, reloading its snapshot if it was evicted"""
+    check_name(name)
+    with collections_lock:
+        store = collections.get(name)
+        if store is not None:
+            collections.move_to_end(name)
+            return store
+        if load_snapshot(name):
+            return collections[name]
+    return None
+
+
+def stored_ids(store) -> set:
+    if store is None:
+        return set()
+    return set(store.index_to_docstore_id.values())
+
+
+def write_documents(name: str, ids: list, texts: list, replace: bool = False) -> tuple:
+    """Embed the documents, then add them to the collection; returns (written, replaced).
+
+    Embedding runs outside collections_lock so other collections stay
+    available meanwhile. Ids another request stored in the meantime are
+    skipped, or with replace, swapped out when their content differs.
+    """
+    if not texts:
+        return 0, 0
+
+    vectors = embedding_model.embed_documents(texts)
+    hashes = [content_hash(text) for text in texts]
+    with collections_lock:
+        store = get_collection(name)
+        existing = stored_ids(store)
+        keep, stale = [], []
+        for i, doc_id in enumerate(ids):
+            if doc_id in existing:
+                if not replace or store.docstore.search(doc_id).metadata.get("hash") == hashes[i]:
+                    continue
+                stale.append(doc_id)
+            keep.append(i)
+        if stale:
+            store.delete(stale)
+        if not keep:
+            return 0, 0
+
+        pairs = [(texts[i], vectors[i]) for i in keep]
+        metadatas = [{"id": ids[i], "hash": hashes[i]} for i in keep]
+        keep_ids = [ids[i] for i in keep]
+        if store is None:
+            collections[name] = FAISS.from_embeddings(pairs, embedding_model, metadatas=metadatas, ids=keep_ids)
+        else:
+            store.add_embeddings(pairs, metadatas=metadatas, ids=keep_ids)
+        enforce_budget(keep=name)
+    return len(keep), len(stale)
+
+
+def add_documents(name: str, ids: list, texts: list) -> int:
+    """Embed only the given documents and append them to the collection"""
+    return write_documents(name, ids, texts)[0]
+
+
+def delete_documents(name: str, ids: list) -> int:
+    with collections_lock:
+        store = get_collection(name)
+        existing = [doc_id for doc_id in ids if doc_id in stored_ids(store)]
+        if existing:
+            store.delete(existing)
+    return len(existing)
+
+
+def load_embedding_model():
+    global embedding_model
+    with model_lock:
+        if embedding_model is None:
+            model = CachedEmbeddings(HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"))
+            registry.register_stats("retriever_embedding_cache", model.stats)
+            embedding_model = model
+    return embedding_model
+
+
+def warm_up():
+    """Load the model, run one inference and restore snapshots, off the request path"""
+    model = load_embedding_model()
+    # Straight to the model, past the cache: the first real call pays for
+    # thread pools, kernel selection and buffer allocation
+    model.embedder.embed_query("warm-up")
 
-@app.post("/index")
-async def create_index(request: Request):
-    global index
+    try:
+        for name in (os.listdir(INDEX_DIR) if os.path.isdir(INDEX_DIR) else []):
+            if not COLLECTION_NAME.match(name):
+                continue
+            if is_transient(name):
+                # Written before transient collections stopped spilling; rebuilt on demand
+                shutil.rmtree(collection_path(name), ignore_errors=True)
+                logger.info(f"Removed snapshot of transient collection {name}")
+            else:
+                load_snapshot(name)
+    except Exception as e:
+        logger.error(f"Error loading index snapshots: {e}")
+
+    for name, index in sharded.items():
+        if index.model != model.model_name:
+            logger.warning(f"Sharded collection {name} was embedded with {index.model}, queries use {model.model_name}")
+
+
+def start_warm_up():
+    """Begin background loading; /health/ready answers 503 until it completes"""
+    readiness.run_in_background("retriever.embedding_model", warm_up)
+
+
+if PRELOAD_MODELS:
+    try:
+        load_embedding_model()
+    except Exception as e:
+        # Retried, and reported through readiness, by warm_up
+        logger.error(f"Error preloading embedding model: {e}")
+
+for name in (os.listdir(SHARDED_DIR) if os.path.isdir(SHARDED_DIR) else []):
+    if not COLLECTION_NAME.match(name):
+        continue
+    try:
+        sharded[name] = index = ShardedIndex(os.path.join(SHARDED_DIR, name))
+        logger.info(f"Sharded collection {name} mapped ({index.ntotal} vectors, {len(index.shards)} shards)")
+    except Exception as e:
+        logger.error(f"Error mapping sharded collection {name}: {e}")
+
+
+@app.on_event("startup")
+def begin_warm_up():
+    start_warm_up()
+
+
+def search_sharded(index, vectors: np.ndarray, k: int) -> list:
+    """[(text, L2 distance)] per query vector"""
+    distances, positions = index.search(vectors, k)
+    return [
+        [(index.document(int(position))["text"], float(distance)) for distance, position in zip(row_distances, row_positions)]
+        for row_distances, row_positions in zip(distances, positions)
+    ]
+
+
+@app.post("/collections")
+async def create_collection(request: Request):
     try:
         data = await request.json()
+        name = check_name(data.get("name", ""))
         texts = data.get("texts", [])
-        
+
+        if get_collection(name) is not None:
+            return {"status": "exists", "collection": name}
+
+        if not embedding_model:
+            return {"status": "embedding_model_unavailable", "collection": name}
+
+        unique = {content_hash(text): text for text in texts}
+        added = add_documents(name, list(unique.keys()), list(unique.values()))
+        return {"status": "created", "collection": name, "count": added}
+
+    except Exception as e:
+        logger.error(f"Error creating collection: {e}")
+        return {"status": "error", "error": str(e)}
+
+@app.get("/collections")
+def list_collections():
+    with collections_lock:
+        loaded = {
+            name: {"vectors": store.index.ntotal, "bytes": collection_bytes(store)}
+            for name, store in collections.items()
+        }
+    on_disk = sorted(
+        name for name in (os.listdir(INDEX_DIR) if os.path.isdir(INDEX_DIR) else [])
+        if name not in loaded and COLLECTION_NAME.match(name)
+    )
+    return {
+        "loaded": loaded,
+        "evicted": on_disk,
+        "sharded": {
+            name: {"vectors": index.ntotal, "shards": len(index.shards), "mapped_bytes": index.nbytes(),
+                   "complete": index.manifest.get("complete", False)}
+            for name, index in sharded.items()
+        },
+        "memory_bytes": sum(c["bytes"] for c in loaded.values()),
+        "memory_budget_bytes": MEMORY_BUDGET_BYTES
+    }
+
+@app.delete("/collections/{name}")
+def drop_collection(name: str, purge: bool = False):
+    """Evict a collection from memory; purge also removes its snapshot"""
+    try:
+        check_name(name)
+        evicted = evict(name, spill=SPILL_TO_DISK and not purge)
+        if purge and os.path.isdir(collection_path(name)):
+            shutil.rmtree(collection_path(name))
+        return {"status": "purged" if purge else "evicted", "collection": name, "was_loaded": evicted}
+
+    except Exception as e:
+        logger.error(f"Error dropping collection: {e}")
+        return {"status": "error", "error": str(e)}
+
+def index_texts(texts: list, collection: str = DEFAULT_COLLECTION) -> dict:
+    """Add texts to a collection, skipping any whose content is already indexed"""
+    try:
+        name = check_name(collection)
+
         if not texts:
             return {"status": "no_texts", "count": 0}
             
         if not embedding_model:
             return {"status": "embedding_model_unavailable", "count": len(texts)}
-            
-        index = FAISS.from_texts(texts, embedding_model)
-        logger.info(f"Index created with {len(texts)} texts")
-        return {"status": "index_created", "count": len(texts)}
+
+        existing = stored_ids(get_collection(name))
+        new_docs = {}
+        for text in texts:
+            doc_id = content_hash(text)
+            if doc_id not in existing:
+                new_docs[doc_id] = text
+
+        with stage("embed_and_add"):
+            added = add_documents(name, list(new_docs.keys()), list(new_docs.values()))
+        logger.info(f"Collection {name} updated: {added} new texts, {len(texts) - added} already indexed")
+        return {
+            "status": "index_updated",
+            "collection": name,
+            "count": len(texts),
+            "added": added,
+            "skipped": len(texts) - added,
+            "total": total_vectors(get_collection(name))
+        }
         
     except Exception as e:
         logger.error(f"Error creating index: {e}")
         return {"status": "error", "error": str(e), "count": 0}
 
+@app.post("/index")
+async def create_index(request: Request):
+    try:
+        data = await request.json()
+    except Exception as e:
+        logger.error(f"Error creating index: {e}")
+        return {"status": "error", "error": str(e), "count": 0}
+    return index_texts(data.get("texts", []), data.get("collection", DEFAULT_COLLECTION))
+
+@app.put("/documents")
+async def upsert_documents(request: Request):
+    """Insert or replace documents by id; unchanged content is not re-embedded"""
+    try:
+        data = await request.json()
+        documents = data.get("documents", [])
+        name = check_name(data.get("collection", DEFAULT_COLLECTION))
+
+        if not documents:
+            return {"status": "no_documents", "count": 0}
+
+        if not embedding_model:
+            return {"status": "embedding_model_unavailable", "count": len(documents)}
+
+        with collections_lock:
+            store = get_collection(name)
+            existing = stored_ids(store)
+            new_docs = {}
+            for doc in documents:
+                text = doc["text"]
+                doc_id = doc.get("id") or content_hash(text)
+                if doc_id in existing and store.docstore.search(doc_id).metadata.get("hash") == content_hash(text):
+                    continue
+                new_docs[doc_id] = text
+
+        added, replaced = write_documents(name, list(new_docs.keys()), list(new_docs.values()), replace=True)
+
+        logger.info(f"Upserted {added} documents into {name} ({replaced} replaced)")
+        return {
+            "status": "upserted",
+            "collection": name,
+            "count": len(documents),
+            "added": added - replaced,
+            "replaced": replaced,
+            "unchanged": len(documents) - added,
+            "total": total_vectors(get_collection(name))
+        }
+
+    except Exception as e:
+        logger.error(f"Error upserting documents: {e}")
+        return {"status": "error", "error": str(e), "count": 0}
+
+@app.delete("/documents")
+async def remove_documents(request: Request):
+    try:
+        data = await request.json()
+        name = check_name(data.get("collection", DEFAULT_COLLECTION))
+        ids = data.get("ids", []) + [content_hash(text) for text in data.get("texts", [])]
+        deleted = delete_documents(name, ids)
+        logger.info(f"Deleted {deleted} documents from {name}")
+        return {
+            "status": "deleted",
+            "collection": name,
+            "count": deleted,
+            "total": total_vectors(get_collection(name))
+        }
+
+    except Exception as e:
+        logger.error(f"Error deleting documents: {e}")
+        return {"status": "error", "error": str(e), "count": 0}
+
+@app.post("/snapshot/save")
+def save_index(collection: str = DEFAULT_COLLECTION):
+    try:
+        check_name(collection)
+        if not save_snapshot(collection):
+            return {"status": "no_index", "collection": collection}
+        return {
+            "status": "saved",
+            "collection": collection,
+            "path": collection_path(collection),
+            "total": total_vectors(get_collection(collection))
+        }
+
+    except Exception as e:
+        logger.error(f"Error saving snapshot: {e}")
+        return {"status": "error", "error": str(e)}
+
+@app.post("/snapshot/load")
+def load_index(collection: str = DEFAULT_COLLECTION):
+    try:
+        check_name(collection)
+        if not load_snapshot(collection):
+            return {"status": "not_found", "collection": collection, "path": collection_path(collection)}
+        return {
+            "status": "loaded",
+            "collection": collection,
+            "path": collection_path(collection),
+            "total": total_vectors(get_collection(collection))
+        }
+
+    except Exception as e:
+        logger.error(f"Error loading snapshot: {e}")
+        return {"status": "error", "error": str(e)}
+
+@app.get("/cache/stats")
+def cache_stats():
+    if not embedding_model:
+        return {"status": "embedding_model_unavailable"}
+    return embedding_model.stats()
+
 @app.get("/retrieve")
-def retrieve(query: str, k: int = 3):
+def retrieve(query: str, k: int = 3, collection: str = DEFAULT_COLLECTION):
     try:
-        if index is None:
+        store = get_collection(collection)
+        if store is None and collection in sharded:
+            with stage("embed_query"):
+                vector = np.asarray([embedding_model.embed_query(query)], dtype=np.float32)
+            with stage("search"):
+                hits = search_sharded(sharded[collection], vector, k)[0]
+            return {"results": [text for text, _ in hits]}
+        if store is None:
             return {"results": [f"No index available. Using query as context: {query}"]}
             
-        results = index.similarity_search(query, k=k)
+        with stage("embed_query"):
+            vector = embedding_model.embed_query(query)
+        with stage("search"), collections_lock:
+            results = store.similarity_search_by_vector(vector, k=k)
         return {"results": [r.page_content for r in results]}
         
     except Exception as e:
         logger.error(f"Error in retrieve: {e}")
-        return {"results": [f"Retrieval error. Query context: {query}"]}
\ No newline at end of file
+        return {"results": [f"Retrieval error. Query context: {query}"]}
+
+@app.post("/retrieve_batch")
+async def retrieve_batch(request: Request):
+    """Embed all queries in one pass and answer them with a single FAISS search.
+
+    Scores are L2 distances, lower is closer (same as similarity_search_with_score).
+    """
+    queries = []
+    try:
+        data = await request.json()
+        queries = data.get("queries", [])
+        k = int(data.get("k", 3))
+        collection = data.get("collection", DEFAULT_COLLECTION)
+        store = get_collection(collection)
+
+        if not queries:
+            return {"results": []}
+
+        if store is None and collection in sharded:
+            with stage("embed_query"):
+                vectors = np.asarray(embedding_model.embed_queries(queries), dtype=np.float32)
+            return {"results": [
+                {"query": query, "results": [{"text": text, "score": score} for text, score in hits]}
+                for query, hits in zip(queries, search_sharded(sharded[collection], vectors, k))
+            ]}
+
+        if store is None or store.index.ntotal == 0:
+            return {"results": [
+                {"query": query, "results": [{"text": f"No index available. Using query as context: {query}", "score": None}]}
+                for query in queries
+            ]}
+
+        with stage("embed_query"):
+            vectors = np.asarray(embedding_model.embed_queries(queries), dtype=np.float32)
+        # Hits are resolved to text before the lock is released: a concurrent
+        # delete or eviction would otherwise leave positions with no document
+        results = []
+        with stage("search"), collections_lock:
+            distances, positions = store.index.search(vectors, min(k, store.index.ntotal))
+            for query, row_distances, row_positions in zip(queries, distances, positions):
+                hits = []
+                for distance, position in zip(row_distances, row_positions):
+                    if position == -1:
+                        continue
+                    doc = store.docstore.search(store.index_to_docstore_id[position])
+                    hits.append({"text": doc.page_content, "score": float(distance)})
+                results.append({"query": query, "results": hits})
+
+        return {"results": results}
+
+    except Exception as e:
+        logger.error(f"Error in retrieve_batch: {e}")
+        return {"results": [
+            {"query": query, "results": [{"text": f"Retrieval error. Query context: {query}", "score": None}]}
+            for query in queries
+        ]}
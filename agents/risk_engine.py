@@ -0,0 +1,231 @@
+from statistics import NormalDist
+import numpy as np
+
+DAY_NS = 86_400 * 10**9
+TRADING_DAYS_PER_YEAR = 252
+# Incremental add/remove accumulates rounding error; rebuild from the window this often
+REBUILD_EVERY = 252
+
+
+def trading_days(stamps: np.ndarray) -> np.ndarray:
+    """Calendar day number of each bar.
+
+    Daily bars are stamped at local midnight, which is up to 12 h either side of
+    UTC midnight, so rounding to the nearest UTC day recovers the exchange date
+    and lets Tokyo, London and New York bars for the same session line up.
+    """
+    return (np.asarray(stamps, dtype=np.int64) + DAY_NS // 2) // DAY_NS
+
+
+def day_start_ns(day: int) -> int:
+    """Earliest timestamp that rounds to the given trading day"""
+    return int(day) * DAY_NS - DAY_NS // 2
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carry the last valid value down each column; leading gaps stay NaN"""
+    valid = ~np.isnan(matrix)
+    rows = np.where(valid, np.arange(len(matrix))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def aligned_closes(history: dict, tickers: list, seed: np.ndarray = None):
+    """(days, closes): one row per day on which any ticker traded, one column per ticker.
+
+    Missing bars are forward-filled. seed is the previous filled row; when given
+    it is prepended so the first new day has a close to return against.
+    """
+    stamps = [trading_days(history[ticker]["timestamp"]) for ticker in tickers]
+    days = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+    closes = np.full((len(days), len(tickers)), np.nan)
+    for column, (ticker, ticker_days) in enumerate(zip(tickers, stamps)):
+        closes[np.searchsorted(days, ticker_days), column] = history[ticker]["close"]
+    if seed is not None:
+        closes = np.vstack([seed, closes])
+    return days, forward_fill(closes)
+
+
+def simple_returns(closes: np.ndarray) -> np.ndarray:
+    """Row-over-row returns; days before a ticker's first bar count as flat"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = closes[1:] / closes[:-1] - 1.0
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+class RollingCovariance:
+    """Mean and co-moment matrix of a sliding window of return rows.
+
+    Adding or dropping one day is a rank-1 update, O(N^2), instead of the
+    O(T N^2) product a full recompute costs.
+    """
+
+    def __init__(self, window: np.ndarray):
+        self.rebuild(window)
+
+    def rebuild(self, window: np.ndarray):
+        self.n = len(window)
+        self.mean = window.mean(axis=0) if self.n else np.zeros(window.shape[1])
+        centered = window - self.mean
+        self.comoment = centered.T @ centered
+
+    def add(self, row: np.ndarray):
+        self.n += 1
+        delta = row - self.mean
+        self.mean += delta / self.n
+        self.comoment += np.outer(delta, row - self.mean)
+
+    def remove(self, row: np.ndarray):
+        if self.n <= 1:
+            self.rebuild(np.empty((0, len(self.mean))))
+            return
+        self.n -= 1
+        delta = row - self.mean
+        self.mean -= delta / self.n
+        self.comoment -= np.outer(delta, row - self.mean)
+
+    def covariance(self) -> np.ndarray:
+        return self.comoment / (self.n - 1) if self.n > 1 else np.zeros_like(self.comoment)
+
+
+def correlation(covariance: np.ndarray) -> np.ndarray:
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = covariance / np.outer(std, std)
+    corr[~np.isfinite(corr)] = 0.0
+    np.fill_diagonal(corr, np.where(std > 0, 1.0, 0.0))
+    return corr
+
+
+def historical_var(pnl: np.ndarray, confidence: float):
+    """(VaR, CVaR) as positive losses from the empirical P&L distribution"""
+    cutoff = np.quantile(pnl, 1 - confidence)
+    return float(-cutoff), float(-pnl[pnl <= cutoff].mean())
+
+
+def parametric_var(mean: float, std: float, confidence: float):
+    """(VaR, CVaR) as positive losses under a normal P&L"""
+    normal = NormalDist()
+    z = normal.inv_cdf(confidence)
+    return float(z * std - mean), float(std * normal.pdf(z) / (1 - confidence) - mean)
+
+
+class RiskModel:
+    """Return window and rolling covariance for a fixed universe of tickers.
+
+    The benchmark, if any, is the last column, so betas fall out of the same
+    covariance matrix. build() starts from history; advance() folds in only the
+    days after the last one seen.
+    """
+
+    def __init__(self, tickers: list, benchmark: str = None, lookback: int = TRADING_DAYS_PER_YEAR):
+        self.tickers = list(tickers)
+        self.benchmark = benchmark
+        self.columns = self.tickers + ([benchmark] if benchmark else [])
+        self.lookback = lookback
+        self.window = np.empty((0, len(self.columns)))
+        self.cov = RollingCovariance(self.window)
+        self.last_day = None
+        self.last_close = None
+        self.since_rebuild = 0
+
+    def next_start_ns(self):
+        return day_start_ns(self.last_day + 1) if self.last_day is not None else None
+
+    def build(self, history: dict):
+        days, closes = aligned_closes(history, self.columns)
+        self.window = simple_returns(closes)[-self.lookback:]
+        self.cov.rebuild(self.window)
+        self.last_day = int(days[-1]) if len(days) else None
+        self.last_close = closes[-1:] if len(closes) else None
+        self.since_rebuild = 0
+
+    def advance(self, history: dict) -> int:
+        """Fold in bars after last_day; returns how many new days were added"""
+        if self.last_day is None:
+            self.build(history)
+            return len(self.window)
+        days, closes = aligned_closes(history, self.columns, seed=self.last_close)
+        new_days = days > self.last_day
+        if not new_days.any():
+            return 0
+        # Keep the seed row plus new days only, in case a late bar landed on an old day
+        closes = closes[np.concatenate([[True], new_days])]
+        returns = simple_returns(closes)
+
+        rows = np.vstack([self.window, returns])
+        oldest = 0
+        for row in returns:
+            self.cov.add(row)
+            if self.cov.n > self.lookback:
+                self.cov.remove(rows[oldest])
+                oldest += 1
+        self.window = rows[oldest:]
+        self.since_rebuild += len(returns)
+        if self.since_rebuild >= REBUILD_EVERY:
+            self.cov.rebuild(self.window)
+            self.since_rebuild = 0
+
+        self.last_day = int(days[new_days][-1])
+        self.last_close = closes[-1:]
+        return len(returns)
+
+    def covariance(self, with_benchmark: bool = False) -> np.ndarray:
+        cov = self.cov.covariance()
+        n = len(self.tickers)
+        return cov if with_benchmark else cov[:n, :n]
+
+    def betas(self):
+        if not self.benchmark:
+            return None
+        cov = self.cov.covariance()
+        benchmark_var = cov[-1, -1]
+        return cov[:-1, -1] / benchmark_var if benchmark_var > 0 else np.full(len(self.tickers), np.nan)
+
+    def metrics(self, values: np.ndarray, confidences: list, horizon_days: int = 1) -> dict:
+        """VaR/CVaR (historical and parametric), volatility and betas for position values.
+
+        Multi-day figures use square-root-of-time scaling of the daily ones.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        total = float(values.sum())
+        n = len(self.tickers)
+        pnl = self.window[:, :n] @ values
+        cov = self.covariance()
+        mean = float(self.cov.mean[:n] @ values) if self.cov.n else 0.0
+        std = float(np.sqrt(max(values @ cov @ values, 0.0)))
+        scale = np.sqrt(horizon_days)
+
+        def block(var, cvar):
+            var, cvar = float(var * scale), float(cvar * scale)
+            return {
+                "var": var,
+                "cvar": cvar,
+                "var_pct": var / total * 100 if total else 0.0,
+                "cvar_pct": cvar / total * 100 if total else 0.0
+            }
+
+        historical, parametric = {}, {}
+        for confidence in confidences:
+            if len(pnl):
+                historical[str(confidence)] = block(*historical_var(pnl, confidence))
+            parametric[str(confidence)] = block(*parametric_var(mean, std, confidence))
+
+        result = {
+            "portfolio_value": total,
+            "observations": len(self.window),
+            "volatility_daily_pct": std / total * 100 if total else 0.0,
+            "volatility_annual_pct": float(std / total * 100 * np.sqrt(TRADING_DAYS_PER_YEAR)) if total else 0.0,
+            "historical": historical,
+            "parametric": parametric
+        }
+        betas = self.betas()
+        if betas is not None:
+            weights = values / total if total else np.zeros(n)
+            result["beta"] = {
+                "benchmark": self.benchmark,
+                "portfolio": float(np.nansum(weights * betas)),
+                "holdings": {ticker: (None if np.isnan(beta) else float(beta)) for ticker, beta in zip(self.tickers, betas)}
+            }
+        return result
@@ -0,0 +1,60 @@
+import tempfile
+import wave
+import io
+import os
+import re
+
+_PHRASE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Set per worker process by init_worker; pyttsx3 engines are not thread-safe,
+# so each process owns exactly one
+_engine = None
+
+
+def init_worker():
+    global _engine
+    import pyttsx3
+    _engine = pyttsx3.init()
+    # The first render loads the voice and audio driver; do it before traffic
+    synthesize("Ready.")
+
+
+def worker_ready() -> bool:
+    return _engine is not None
+
+
+def synthesize(text: str) -> bytes:
+    """Render one phrase to WAV bytes; pyttsx3 can only write files, so use a private temp file"""
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        _engine.save_to_file(text, path)
+        _engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+def split_phrases(text: str) -> list:
+    """Sentence/line level phrases, the unit of the phrase cache"""
+    return [phrase.strip() for phrase in _PHRASE_END.split(text) if phrase.strip()]
+
+
+def splice(clips: list, gap_seconds: float = 0.15) -> bytes:
+    """Concatenate WAV clips rendered by the same engine, with a short pause between them"""
+    params, frames = None, []
+    for clip in clips:
+        with wave.open(io.BytesIO(clip), "rb") as reader:
+            if params is None:
+                params = reader.getparams()
+                silence = b"\0" * (int(params.framerate * gap_seconds) * params.sampwidth * params.nchannels)
+            elif frames:
+                frames.append(silence)
+            frames.append(reader.readframes(reader.getnframes()))
+
+    output = io.BytesIO()
+    with wave.open(output, "wb") as writer:
+        writer.setparams(params)
+        writer.writeframes(b"".join(frames))
+    return output.getvalue()
@@ -0,0 +1,116 @@
+import re
+import os
+import csv
+import json
+import threading
+import numpy as np
+
+DIMENSIONS = ["region", "country", "sector"]
+REQUIRED_COLUMNS = ["ticker", "name", "region", "sector"]
+UNKNOWN = "Unknown"
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_NON_WORD = re.compile(r"[^\w.&]+")
+
+
+def normalize(name) -> str:
+    """Lookup key for a ticker, name or alias: lowercase, no parentheticals or punctuation runs"""
+    return _NON_WORD.sub(" ", _PARENTHETICAL.sub(" ", str(name).lower())).strip()
+
+
+class InstrumentTaxonomy:
+    """Instrument master compiled into a hash index of ticker/name/alias -> instrument row.
+
+    Each dimension is stored as an integer code per instrument, with the last
+    code of every dimension reserved for unknown holdings.
+    """
+
+    def __init__(self, records: list, source: str = None):
+        self.source = source
+        self.keys = {}
+        self.labels = {}
+        self.codes = {}
+        self.size = len(records)
+
+        for dimension in DIMENSIONS:
+            values = [record.get(dimension) or UNKNOWN for record in records]
+            labels = sorted(set(values) - {UNKNOWN}) + [UNKNOWN]
+            position = {label: i for i, label in enumerate(labels)}
+            self.labels[dimension] = labels
+            # Extra trailing slot so unmatched holdings (row -1) map to Unknown
+            self.codes[dimension] = np.array([position[v] for v in values] + [len(labels) - 1], dtype=np.int64)
+
+        for row, record in enumerate(records):
+            aliases = record.get("aliases") or []
+            if isinstance(aliases, str):
+                aliases = [alias for alias in aliases.split(";") if alias.strip()]
+            for key in [record.get("ticker"), record.get("name"), *aliases]:
+                if key:
+                    self.keys.setdefault(normalize(key), row)
+
+    @classmethod
+    def load(cls, path: str) -> "InstrumentTaxonomy":
+        if path.endswith(".json"):
+            with open(path) as f:
+                records = json.load(f)
+            if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                raise ValueError(f"{path} is not a list of instrument records")
+            columns = set().union(*records) if records else set()
+        else:
+            with open(path, newline="") as f:
+                reader = csv.DictReader(f)
+                records = list(reader)
+                columns = set(reader.fieldnames or [])
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+        taxonomy = cls(records, source=path)
+        if not taxonomy.keys:
+            raise ValueError(f"{path} has no instruments")
+        return taxonomy
+
+    def rows(self, names) -> np.ndarray:
+        """Instrument row per holding name, -1 where the name is not in the master"""
+        distinct = {name: self.keys.get(normalize(name), -1) for name in set(names)}
+        return np.fromiter(map(distinct.__getitem__, names), dtype=np.int64, count=len(names))
+
+    def dimension_codes(self, rows: np.ndarray, dimension: str) -> np.ndarray:
+        return self.codes[dimension][rows]
+
+    def stats(self) -> dict:
+        return {
+            "source": self.source,
+            "instruments": self.size,
+            "keys": len(self.keys),
+            "dimensions": {dimension: len(labels) - 1 for dimension, labels in self.labels.items()}
+        }
+
+
+class TaxonomyHolder:
+    """Holds the live taxonomy; reload builds a new index and swaps it in one assignment.
+
+    Reloads from another file are confined to the directory of the configured
+    master, and a file that fails validation leaves the live index in place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.root = os.path.dirname(os.path.realpath(path))
+        self.current = InstrumentTaxonomy([])
+        self.lock = threading.Lock()
+
+    def resolve(self, path: str) -> str:
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([resolved, self.root]) != self.root:
+            raise PermissionError(f"{path} is outside the instrument master directory")
+        return resolved
+
+    def reload(self, path: str = None) -> InstrumentTaxonomy:
+        source = self.resolve(path) if path else self.path
+        with self.lock:
+            # Raises before the swap, so a bad file never replaces the live index
+            taxonomy = InstrumentTaxonomy.load(source)
+            # Readers that already grabbed the old index finish on it untouched
+            self.current = taxonomy
+            self.path = source
+            return taxonomy
@@ -0,0 +1,70 @@
+import subprocess
+import numpy as np
+
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Set per worker process by init_worker, so each process loads the model once,
+# or inherited from a parent that called preload before forking its workers
+_model = None
+
+
+def preload(model_name: str):
+    global _model
+    import whisper
+    _model = whisper.load_model(model_name)
+
+
+def init_worker(model_name: str):
+    if _model is None:
+        preload(model_name)
+    warm_up()
+
+
+def warm_up():
+    # One second of silence, so the first real request doesn't pay for lazy kernel setup
+    _model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), fp16=False)
+
+
+def worker_ready() -> bool:
+    return _model is not None
+
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Decode any ffmpeg-readable upload to float32 mono PCM entirely through pipes"""
+    process = subprocess.run(
+        ["ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1"],
+        input=data, capture_output=True, check=False
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {process.stderr.decode(errors='ignore')[-300:]}")
+    return np.frombuffer(process.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def split_audio(audio: np.ndarray, chunk_seconds: float, search_seconds: float = 1.0) -> list:
+    """Split into ~chunk_seconds pieces, cutting at the quietest 20 ms frame near each boundary"""
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    if len(audio) <= chunk:
+        return [audio]
+
+    frame = SAMPLE_RATE // 50
+    search = int(search_seconds * SAMPLE_RATE)
+    chunks, start = [], 0
+    while len(audio) - start > chunk:
+        target = start + chunk
+        window = audio[max(start + frame, target - search):target + search]
+        n_frames = len(window) // frame
+        if n_frames:
+            energy = np.square(window[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+            cut = max(start + frame, target - search) + int(energy.argmin()) * frame
+        else:
+            cut = target
+        chunks.append(audio[start:cut])
+        start = cut
+    chunks.append(audio[start:])
+    return chunks
+
+
+def transcribe_chunk(audio: np.ndarray) -> str:
+    return _model.transcribe(audio, fp16=False)["text"].strip()
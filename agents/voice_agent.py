@@ -1,22 +1,305 @@
 from fastapi import FastAPI, File, UploadFile
-import whisper
-import pyttsx3
+from fastapi.responses import Response
+from concurrent.futures import ProcessPoolExecutor
+from agents.transcription import (
+    SAMPLE_RATE, preload, init_worker, worker_ready, decode_audio, split_audio, transcribe_chunk
+)
+from agents import speech_synthesis
+from common.instrumentation import instrument, stage, registry, readiness
+from collections import OrderedDict
+import multiprocessing
+import threading
+import hashlib
+import asyncio
+import logging
+import time
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+STT_WORKERS = int(os.getenv("STT_WORKERS", "2"))
+# Whisper decodes 30 s windows, so longer clips are split and run in parallel
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "30"))
+# Load Whisper once here and fork the workers from it, sharing the weights
+# copy-on-write instead of holding one copy per worker
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
 
 app = FastAPI()
-model = whisper.load_model("base")
-tts_engine = pyttsx3.init()
+instrument(app, "voice")
+readiness.register("voice.stt")
+readiness.register("voice.tts")
+
+if PRELOAD_MODELS:
+    preload(WHISPER_MODEL)
+
+# Each worker process loads Whisper once in its initializer (unless it inherited
+# the preloaded model) and warms it up; spawn keeps the workers free of this
+# process's state
+stt_pool = ProcessPoolExecutor(
+    max_workers=STT_WORKERS,
+    mp_context=multiprocessing.get_context("fork" if PRELOAD_MODELS else "spawn"),
+    initializer=init_worker,
+    initargs=(WHISPER_MODEL,),
+)
+if PRELOAD_MODELS:
+    # A fork pool starts all its workers on first submit; do that now, while
+    # this process is still single-threaded
+    stt_pool.submit(worker_ready)
+stt_stats = {"requests": 0, "chunks": 0, "audio_seconds": 0.0, "wall_seconds": 0.0}
+stt_stats_lock = threading.Lock()
+
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "2"))
+TTS_OUTPUT_DIR = os.getenv("TTS_OUTPUT_DIR", "/tmp/tts_output")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "")
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024)
+TTS_CACHE_DISK_MAX_BYTES = int(float(os.getenv("TTS_CACHE_DISK_MAX_MB", "512")) * 1024 * 1024)
+# format=file leaves one WAV per distinct text, so the output directory is bounded too
+TTS_OUTPUT_MAX_BYTES = int(float(os.getenv("TTS_OUTPUT_MAX_MB", "256")) * 1024 * 1024)
+
+# One pyttsx3 engine per worker process, so requests no longer serialize on runAndWait
+tts_pool = ProcessPoolExecutor(
+    max_workers=TTS_WORKERS,
+    mp_context=multiprocessing.get_context("spawn"),
+    initializer=speech_synthesis.init_worker,
+)
+
+
+class WavDirectory:
+    """Directory of <key>.wav files kept under a byte budget, least recently used out first.
+
+    Files are written to a temp name and renamed into place, so readers never
+    see a partial WAV. Reads and repeated writes bump a file's access time,
+    which is what eviction orders by.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def _entries(self) -> list:
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".wav"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+        return entries
+
+    def read(self, key: str):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Never written, or evicted between the open and the touch
+            return None
+        return data
+
+    def write(self, key: str, data: bytes) -> str:
+        path = self.path(key)
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str):
+        # Rescanned rather than trusted: other writers and deletes change the total
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"bytes": self.size, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+class PhraseAudioCache:
+    """LRU of rendered phrase audio by content hash, bounded in bytes, with an optional disk tier"""
+
+    def __init__(self, max_bytes: int, cache_dir: str = "", disk_max_bytes: int = TTS_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.clips = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self.disk = WavDirectory(cache_dir, disk_max_bytes) if cache_dir else None
+
+    @staticmethod
+    def key(phrase: str) -> str:
+        return hashlib.sha256(phrase.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, clip: bytes):
+        if key in self.clips:
+            return
+        self.clips[key] = clip
+        self.size += len(clip)
+        while self.size > self.max_bytes and len(self.clips) > 1:
+            _, evicted = self.clips.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get(self, phrase: str):
+        key = self.key(phrase)
+        with self.lock:
+            clip = self.clips.get(key)
+            if clip is not None:
+                self.clips.move_to_end(key)
+                self.counters["hits"] += 1
+                return clip
+            clip = self.disk.read(key) if self.disk else None
+            if clip is not None:
+                self._remember(key, clip)
+                self.counters["disk_hits"] += 1
+                return clip
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, phrase: str, clip: bytes):
+        key = self.key(phrase)
+        with self.lock:
+            self._remember(key, clip)
+        if self.disk:
+            try:
+                self.disk.write(key, clip)
+            except Exception as e:
+                logger.warning(f"TTS cache write failed: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            stats = {**self.counters, "phrases": len(self.clips), "bytes": self.size, "max_bytes": self.max_bytes}
+        if self.disk:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+phrase_cache = PhraseAudioCache(TTS_CACHE_MAX_BYTES, TTS_CACHE_DIR)
+registry.register_stats("voice_tts_cache", phrase_cache.stats)
+tts_output = WavDirectory(TTS_OUTPUT_DIR, TTS_OUTPUT_MAX_BYTES)
+registry.register_stats("voice_tts_output", tts_output.stats)
+
+
+def warm_pool(pool: ProcessPoolExecutor, workers: int, ready):
+    # One task per worker starts every process; the initializers load and warm
+    # the models, and a broken pool (failed load) raises here
+    for future in [pool.submit(ready) for _ in range(workers)]:
+        future.result()
+
+
+@app.on_event("startup")
+def start_warm_up():
+    # In the background, so /health/live answers while /health/ready says 503
+    readiness.run_in_background("voice.stt", lambda: warm_pool(stt_pool, STT_WORKERS, worker_ready))
+    readiness.run_in_background("voice.tts", lambda: warm_pool(tts_pool, TTS_WORKERS, speech_synthesis.worker_ready))
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    stt_pool.shutdown(wait=False, cancel_futures=True)
+    tts_pool.shutdown(wait=False, cancel_futures=True)
+
 
 @app.post("/stt")
 async def transcribe_audio(file: UploadFile = File(...)):
-    audio_path = f"/tmp/{file.filename}"
-    with open(audio_path, "wb") as f:
-        f.write(await file.read())
-    result = model.transcribe(audio_path)
-    return {"transcription": result["text"]}
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    # Decoded in memory through ffmpeg pipes, no temp files
+    with stage("decode"):
+        audio = await loop.run_in_executor(None, decode_audio, await file.read())
+    chunks = split_audio(audio, STT_CHUNK_SECONDS)
+    with stage("transcribe"):
+        texts = await asyncio.gather(*(
+            loop.run_in_executor(stt_pool, transcribe_chunk, chunk) for chunk in chunks
+        ))
+
+    wall_seconds = time.perf_counter() - start
+    audio_seconds = len(audio) / SAMPLE_RATE
+    with stt_stats_lock:
+        stt_stats["requests"] += 1
+        stt_stats["chunks"] += len(chunks)
+        stt_stats["audio_seconds"] += audio_seconds
+        stt_stats["wall_seconds"] += wall_seconds
+
+    return {
+        "transcription": " ".join(text for text in texts if text),
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall_seconds,
+        "audio_seconds_per_second": audio_seconds / wall_seconds if wall_seconds else 0.0,
+        "chunks": len(chunks)
+    }
+
+@app.get("/stt/stats")
+def transcription_stats():
+    with stt_stats_lock:
+        stats = dict(stt_stats)
+    stats["audio_seconds_per_second"] = (
+        stats["audio_seconds"] / stats["wall_seconds"] if stats["wall_seconds"] else 0.0
+    )
+    stats["workers"] = STT_WORKERS
+    return stats
 
 @app.post("/tts")
-async def speak_text(text: str):
-    audio_path = "/tmp/output_audio.mp3"
-    tts_engine.save_to_file(text, audio_path)
-    tts_engine.runAndWait()
-    return {"audio_file": audio_path}
\ No newline at end of file
+async def speak_text(text: str, format: str = "file"):
+    """Render text phrase by phrase, reusing cached phrase audio, and splice the result.
+
+    format=file writes a content-addressed WAV and returns its path; the
+    output directory keeps the most recently used files within
+    TTS_OUTPUT_MAX_MB. format=wav returns the audio bytes directly.
+    """
+    loop = asyncio.get_running_loop()
+    phrases = speech_synthesis.split_phrases(text) or [text]
+
+    clips = [phrase_cache.get(phrase) for phrase in phrases]
+    cached = sum(clip is not None for clip in clips)
+    missing = {phrase for phrase, clip in zip(phrases, clips) if clip is None}
+    # Distinct uncached phrases render in parallel across the worker pool
+    with stage("synthesize"):
+        rendered = dict(zip(missing, await asyncio.gather(*(
+            loop.run_in_executor(tts_pool, speech_synthesis.synthesize, phrase) for phrase in missing
+        ))))
+    for phrase, clip in rendered.items():
+        phrase_cache.put(phrase, clip)
+    clips = [clip if clip is not None else rendered[phrase] for phrase, clip in zip(phrases, clips)]
+
+    audio = clips[0] if len(clips) == 1 else speech_synthesis.splice(clips)
+    if format == "wav":
+        return Response(content=audio, media_type="audio/wav")
+
+    audio_path = tts_output.write(hashlib.sha256(audio).hexdigest(), audio)
+    return {"audio_file": audio_path, "phrases": len(phrases), "cached_phrases": cached}
+
+@app.get("/tts/stats")
+def synthesis_stats():
+    return phrase_cache.stats()
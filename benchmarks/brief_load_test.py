@@ -0,0 +1,352 @@
+"""End-to-end latency and throughput of /brief against stubbed backends.
+
+Starts every agent and the orchestrator as separate uvicorn processes on free
+local ports (or, with --mode monolith, the orchestrator with the retriever,
+analysis and language agents in-process), with Gemini, yfinance, Alpha Vantage and the embedding model
+replaced by deterministic stubs (benchmarks/stubs.py). Drives concurrent load
+per endpoint and reports p50/p95/p99 latency and requests per second, per
+endpoint and per stage, to stdout and a JSON file.
+
+Run from the repository root:
+    python -m benchmarks.brief_load_test --concurrency 16 --requests 200
+    python -m benchmarks.brief_load_test --baseline benchmarks/results/baseline.json
+    python -m benchmarks.brief_load_test --mode monolith --out benchmarks/results/brief_load_monolith.json
+"""
+from benchmarks.stubs import LatencyProfile, install_stubs
+from common.sse import aiter_events
+import multiprocessing
+import subprocess
+import argparse
+import tempfile
+import asyncio
+import socket
+import httpx
+import json
+import time
+import sys
+import os
+
+AGENTS = ["api", "retriever", "analysis", "language", "orchestrator"]
+# Processes per deployment mode; the monolith still needs api and analysis
+# processes for the market_data_batch and risk_metrics endpoints
+MODES = {
+    "distributed": {agent: agent for agent in AGENTS},
+    "monolith": {"api": "api", "analysis": "analysis", "orchestrator": "monolith"},
+}
+ENDPOINTS = ["brief", "brief_stream", "market_data_batch", "risk_metrics"]
+PERCENTILES = [50, 95, 99]
+
+PORTFOLIO = {"TSMC": 150000, "Samsung Electronics": 90000, "Apple Inc": 200000, "Asia Pacific Fund": 60000}
+TICKERS = ["AAPL", "MSFT", "NVDA", "TSM", "JPM", "XOM", "UNH", "CAT", "AMZN", "GOOG"]
+CONTEXTS = [
+    [f"Filing {c} paragraph {p}: revenue in segment {p % 7} rose {p % 13}% on demand from region {c % 5}. "
+     f"Management guided margins {'up' if p % 2 else 'down'} for the next quarter." for p in range(12)]
+    for c in range(8)
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_agent(agent: str, port: int, env: dict, profile: dict):
+    """Process target: install the stubs, then serve the agent app"""
+    os.environ.update(env)
+    import uvicorn
+    app = install_stubs(agent, LatencyProfile(**profile))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_stack(profile: LatencyProfile, workdir: str, mode: str = "distributed") -> tuple:
+    targets = MODES[mode]
+    ports = {agent: free_port() for agent in AGENTS}
+    urls = {agent: f"http://127.0.0.1:{port}" for agent, port in ports.items()}
+    env = {
+        "ORCHESTRATOR_MODE": mode,
+        "RETRIEVER_URL": urls["retriever"],
+        "ANALYSIS_URL": urls["analysis"],
+        "LANGUAGE_URL": urls["language"],
+        # Keep every persistent tier inside the scratch directory
+        "EMBEDDING_CACHE_DIR": "",
+        "RETRIEVER_INDEX_DIR": os.path.join(workdir, "faiss_index"),
+        "RETRIEVER_SHARDED_DIR": os.path.join(workdir, "sharded_index"),
+        "OHLCV_STORE_DIR": os.path.join(workdir, "ohlcv"),
+        "SUMMARY_CACHE_DB": "",
+        "REFERENCE_CACHE_DB": "",
+        "RISK_BENCHMARK": "SPY",
+    }
+    context = multiprocessing.get_context("spawn")
+    processes = {
+        agent: context.Process(target=run_agent, args=(target, ports[agent], env, profile.to_dict()), daemon=True)
+        for agent, target in targets.items()
+    }
+    for process in processes.values():
+        process.start()
+    return processes, {agent: urls[agent] for agent in targets}
+
+
+async def wait_ready(urls: dict, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        for agent, url in urls.items():
+            while True:
+                try:
+                    if (await client.get(f"{url}/health/ready", timeout=2)).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{agent} did not start within {timeout}s")
+                await asyncio.sleep(0.2)
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+    return {
+        **{f"p{p}": pick(p) for p in PERCENTILES},
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1],
+        "count": len(ordered),
+    }
+
+
+def make_request(endpoint: str, i: int, distinct_queries: int) -> dict:
+    query = f"What changed in segment {i % distinct_queries % 7} and how exposed are we? (q{i % distinct_queries})"
+    if endpoint in ("brief", "brief_stream"):
+        return {"query": query, "portfolio": PORTFOLIO, "texts": CONTEXTS[i % len(CONTEXTS)]}
+    if endpoint == "market_data_batch":
+        return {"tickers": TICKERS[i % 3:i % 3 + 6]}
+    return {"portfolio": {ticker: 10000 + 1000 * j for j, ticker in enumerate(TICKERS)}}
+
+
+async def call(client: httpx.AsyncClient, urls: dict, endpoint: str, payload: dict) -> dict:
+    """One request; returns total latency and any client-side stage timings in ms"""
+    start = time.perf_counter()
+    stages = {}
+    if endpoint == "brief_stream":
+        async with client.stream("POST", f"{urls['orchestrator']}/brief/stream", json=payload) as response:
+            response.raise_for_status()
+            async for event, data in aiter_events(response.aiter_lines()):
+                elapsed = (time.perf_counter() - start) * 1000
+                stages.setdefault("first_event", elapsed)
+                if event in ("documents", "exposure", "token"):
+                    stages.setdefault(f"first_{event}", elapsed)
+                elif event == "error":
+                    raise RuntimeError(data.get("error"))
+        return {"latency_ms": (time.perf_counter() - start) * 1000, "stages": stages}
+
+    url = {
+        "brief": f"{urls['orchestrator']}/brief",
+        "market_data_batch": f"{urls['api']}/market_data/batch",
+        "risk_metrics": f"{urls['analysis']}/risk_metrics",
+    }[endpoint]
+    response = await client.post(url, json=payload)
+    response.raise_for_status()
+    body = response.json()
+    if body.get("status") == "error" or "error" in body:
+        raise RuntimeError(body.get("error"))
+    return {"latency_ms": (time.perf_counter() - start) * 1000, "stages": stages}
+
+
+async def drive(urls: dict, endpoint: str, requests: int, concurrency: int, distinct_queries: int, offset: int = 0):
+    """Closed-loop load: `concurrency` workers issue `requests` calls back to back"""
+    results, errors = [], []
+    counter = iter(range(offset, offset + requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def worker():
+            for i in counter:
+                try:
+                    results.append(await call(client, urls, endpoint, make_request(endpoint, i, distinct_queries)))
+                except Exception as e:
+                    errors.append(str(e) or type(e).__name__)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return results, errors, wall
+
+
+async def collect_stages(urls: dict) -> dict:
+    """Drain server-side stage samples from every process"""
+    stages = {}
+    async with httpx.AsyncClient() as client:
+        for agent, url in urls.items():
+            samples = (await client.get(f"{url}/_bench/stages")).json()
+            for stage, values in samples.items():
+                stages[f"{agent}.{stage}"] = values
+    return stages
+
+
+async def run(args, urls: dict) -> dict:
+    report = {}
+    for endpoint in args.endpoints:
+        # Separate query ranges, so one endpoint never warms the summary cache for another
+        offset = ENDPOINTS.index(endpoint) * 10**7
+        if args.warmup:
+            await drive(urls, endpoint, args.warmup, min(args.concurrency, args.warmup), args.distinct_queries,
+                        offset=offset + 10**6)
+        await collect_stages(urls)
+
+        results, errors, wall = await drive(urls, endpoint, args.requests, args.concurrency, args.distinct_queries, offset)
+        client_stages = {}
+        for result in results:
+            for stage, ms in result["stages"].items():
+                client_stages.setdefault(f"client.{stage}", []).append(ms)
+        stages = {**client_stages, **await collect_stages(urls)}
+
+        report[endpoint] = {
+            "requests": args.requests,
+            "ok": len(results),
+            "errors": len(errors),
+            "error_samples": sorted(set(errors))[:5],
+            "wall_seconds": wall,
+            "rps": len(results) / wall if wall else 0.0,
+            "latency_ms": percentiles([result["latency_ms"] for result in results]),
+            "stages": {stage: percentiles(samples) for stage, samples in sorted(stages.items())},
+        }
+        print_endpoint(endpoint, report[endpoint])
+    return report
+
+
+def print_endpoint(endpoint: str, result: dict):
+    latency = result["latency_ms"]
+    print(f"\n{endpoint}: {result['ok']}/{result['requests']} ok, {result['rps']:.1f} req/s, "
+          f"p50 {latency.get('p50', 0):.0f} ms, p95 {latency.get('p95', 0):.0f} ms, p99 {latency.get('p99', 0):.0f} ms")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<40} n={stats['count']:<5} p50 {stats['p50']:>8.1f}  p95 {stats['p95']:>8.1f}  p99 {stats['p99']:>8.1f} ms")
+    for error in result["error_samples"]:
+        print(f"  error: {error}")
+
+
+def config_mismatches(config: dict, baseline: dict) -> list:
+    """Settings that differ from the baseline's; request counts may differ, the rest may not"""
+    recorded = baseline.get("config", {})
+    return [
+        f"{key}: baseline {recorded.get(key)!r}, this run {value!r}"
+        for key, value in config.items()
+        if key not in ("requests", "warmup") and recorded.get(key) != value
+    ]
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Endpoints whose p95 grew or throughput fell by more than tolerance"""
+    regressions = []
+    for endpoint, result in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before or not result["latency_ms"] or not before["latency_ms"]:
+            continue
+        p95, old_p95 = result["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {old_p95:.0f} -> {p95:.0f} ms")
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: {before['rps']:.1f} -> {result['rps']:.1f} req/s")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{endpoint}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def run_stack(args, profile: LatencyProfile, mode: str) -> tuple:
+    """Start a stack in the given deployment mode, load it, and tear it down.
+
+    Returns (per-endpoint results, seconds until every process answered).
+    """
+    with tempfile.TemporaryDirectory(prefix="brief-bench-") as workdir:
+        processes, urls = start_stack(profile, workdir, mode)
+        try:
+            start = time.perf_counter()
+            asyncio.run(wait_ready(urls))
+            ready_seconds = time.perf_counter() - start
+            print(f"{mode.capitalize()} stack ({len(processes)} processes) ready in {ready_seconds:.1f}s")
+            return asyncio.run(run(args, urls)), ready_seconds
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.join(timeout=10)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def add_load_arguments(parser: argparse.ArgumentParser, endpoints: list = ENDPOINTS):
+    """Load shape and stub latency options, shared with benchmarks.deployment_modes"""
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=endpoints)
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=8, help="unmeasured requests per endpoint first")
+    parser.add_argument("--distinct-queries", type=int, default=10**9,
+                        help="cycle through this many queries; lower it to measure summary cache hits")
+    for field, value in LatencyProfile().to_dict().items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+
+
+def profile_from(args) -> LatencyProfile:
+    return LatencyProfile(**{field: getattr(args, field) for field in LatencyProfile().to_dict()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=list(MODES), default="distributed", help="orchestrator deployment mode")
+    add_load_arguments(parser)
+    parser.add_argument("--out", default="benchmarks/results/brief_load.json")
+    parser.add_argument("--baseline", help="earlier results file; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/RPS drift vs baseline")
+    args = parser.parse_args()
+
+    profile = profile_from(args)
+    # Read before running, since --out may point at the same file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    config = {
+        "mode": args.mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "distinct_queries": args.distinct_queries,
+        "latency": profile.to_dict(),
+    }
+    # Numbers from another mode or load shape are not comparable
+    mismatches = config_mismatches(config, baseline) if baseline is not None else []
+    if mismatches:
+        parser.error("run does not match the baseline's settings: " + "; ".join(mismatches))
+
+    endpoints, ready_seconds = run_stack(args, profile, args.mode)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": git_revision(),
+        "startup_seconds": ready_seconds,
+        "config": config,
+        "endpoints": endpoints,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
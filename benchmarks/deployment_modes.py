@@ -0,0 +1,68 @@
+"""Distributed vs monolith orchestrator: the same brief load against both modes.
+
+Runs benchmarks.brief_load_test's stack once per mode with identical stub
+latencies and request streams, then prints p50/p95/p99 and throughput side by
+side. The difference is the cost of the localhost HTTP hops and JSON
+round trips to the retriever, analysis and language agents.
+
+Run from the repository root:
+    python -m benchmarks.deployment_modes --concurrency 16 --requests 200
+"""
+from benchmarks.brief_load_test import MODES, add_load_arguments, profile_from, run_stack, git_revision
+import argparse
+import json
+import time
+import os
+
+
+def print_comparison(modes: dict):
+    names = list(modes)
+    print(f"\n{'endpoint':<14}{'metric':<10}" + "".join(f"{name:>14}" for name in names) + f"{'change':>10}")
+    endpoints = modes[names[0]]["endpoints"]
+    for endpoint in endpoints:
+        rows = [("p50 ms", "p50"), ("p95 ms", "p95"), ("p99 ms", "p99"), ("req/s", None)]
+        for label, key in rows:
+            values = [
+                modes[name]["endpoints"][endpoint]["latency_ms"].get(key, 0.0) if key
+                else modes[name]["endpoints"][endpoint]["rps"]
+                for name in names
+            ]
+            change = f"{(values[-1] / values[0] - 1) * 100:+.0f}%" if values[0] else ""
+            print(f"{endpoint:<14}{label:<10}" + "".join(f"{value:>14.1f}" for value in values) + f"{change:>10}")
+    startup = [modes[name]["startup_seconds"] for name in names]
+    print(f"{'startup':<14}{'seconds':<10}" + "".join(f"{value:>14.1f}" for value in startup))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_load_arguments(parser, endpoints=["brief", "brief_stream"])
+    parser.add_argument("--out", default="benchmarks/results/deployment_modes.json")
+    args = parser.parse_args()
+    profile = profile_from(args)
+
+    modes = {}
+    for mode in MODES:
+        endpoints, ready_seconds = run_stack(args, profile, mode)
+        modes[mode] = {"startup_seconds": ready_seconds, "endpoints": endpoints}
+    print_comparison(modes)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": git_revision(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "distinct_queries": args.distinct_queries,
+            "latency": profile.to_dict(),
+        },
+        "modes": modes,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Throughput of the exposure engine versus the original per-holding loop.
+
+Run from the repository root:
+    python -m benchmarks.exposure_benchmark
+"""
+import time
+import numpy as np
+from agents.exposure_engine import compute_exposure, ASIA_TECH_TERMS
+
+SIZES = [1_000, 100_000, 1_000_000]
+DISTINCT_NAMES = 20_000
+BASE_NAMES = ["TSMC", "Samsung Electronics", "Apple Inc", "Taiwan Semiconductor", "SK Hynix",
+              "Microsoft Corp", "China Mobile", "Korea Electric", "Nvidia Corp", "Asia Pacific Fund"]
+
+
+def make_book(size: int, rng: np.random.Generator):
+    pool = [f"{BASE_NAMES[i % len(BASE_NAMES)]} {i}" for i in range(DISTINCT_NAMES)]
+    names = [pool[i] for i in rng.integers(0, DISTINCT_NAMES, size)]
+    values = rng.uniform(1_000, 1_000_000, size)
+    funds = [f"fund-{i}" for i in rng.integers(0, 50, size)]
+    return names, values, funds
+
+
+def legacy_exposure(names, values):
+    # The original loop, over line items rather than a dict so duplicates are kept
+    exposure_report = []
+    for asset, value in zip(names, values):
+        if any(term in asset.lower() for term in ASIA_TECH_TERMS):
+            exposure_report.append(value)
+    return sum(exposure_report), sum(values)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'holdings':>10} {'engine/s':>14} {'+funds/s':>14} {'legacy/s':>14} {'speedup':>8}")
+    for size in SIZES:
+        names, values, funds = make_book(size, rng)
+        engine = timed(compute_exposure, names, values)
+        with_funds = timed(compute_exposure, names, values, funds)
+        legacy = timed(legacy_exposure, names, values)
+        print(f"{size:>10,} {size / engine:>14,.0f} {size / with_funds:>14,.0f} "
+              f"{size / legacy:>14,.0f} {legacy / engine:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
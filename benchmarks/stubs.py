@@ -0,0 +1,266 @@
+"""Deterministic stand-ins for the external backends, with injectable latency.
+
+Each agent process installs only the stubs it needs (install_stubs), so the
+real agent code paths run end to end while Gemini, yfinance, Alpha Vantage
+and HuggingFace are replaced by seeded fakes that sleep for a configured time.
+"""
+from dataclasses import dataclass, asdict
+from collections import defaultdict
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import pandas as pd
+import threading
+import hashlib
+import time
+import os
+
+EMBEDDING_DIM = 384
+
+
+@dataclass
+class LatencyProfile:
+    embed_ms: float = 20.0            # per embedding call
+    embed_item_ms: float = 0.5        # plus per text
+    llm_first_token_ms: float = 400.0
+    llm_token_ms: float = 15.0
+    llm_tokens: int = 60
+    market_ms: float = 150.0          # per yfinance call
+    overview_ms: float = 80.0         # per Alpha Vantage call
+    jitter: float = 0.1               # +/- fraction, seeded
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class StageRecorder:
+    """Thread-safe lists of stage durations in milliseconds"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, ms: float):
+        with self.lock:
+            self.samples[stage].append(ms)
+
+    def drain(self) -> dict:
+        with self.lock:
+            samples, self.samples = dict(self.samples), defaultdict(list)
+        return samples
+
+
+recorder = StageRecorder()
+
+
+class Delay:
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.rng = np.random.default_rng(profile.seed)
+        self.lock = threading.Lock()
+
+    def __call__(self, ms: float):
+        if ms <= 0:
+            return
+        with self.lock:
+            factor = 1 + self.rng.uniform(-self.profile.jitter, self.profile.jitter)
+        time.sleep(ms * factor / 1000)
+
+
+def seeded_vector(text: str, dim: int = EMBEDDING_DIM) -> list:
+    seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+class StubEmbeddings(Embeddings):
+    model_name = "stub-embeddings"
+
+    def __init__(self, profile: LatencyProfile, **_):
+        self.profile = profile
+        self.delay = Delay(profile)
+
+    def embed_documents(self, texts: list) -> list:
+        start = time.perf_counter()
+        self.delay(self.profile.embed_ms + self.profile.embed_item_ms * len(texts))
+        vectors = [seeded_vector(text) for text in texts]
+        recorder.record("embedding", (time.perf_counter() - start) * 1000)
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """generate_content(prompt[, stream=True]) with Gemini's response shape"""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.delay = Delay(profile)
+
+    def _tokens(self, prompt: str) -> list:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return [f"{digest[i % 60:i % 60 + 4]} " for i in range(self.profile.llm_tokens)]
+
+    def _stream(self, prompt: str):
+        start = time.perf_counter()
+        self.delay(self.profile.llm_first_token_ms)
+        for i, token in enumerate(self._tokens(prompt)):
+            if i:
+                self.delay(self.profile.llm_token_ms)
+            yield _Chunk(token)
+        recorder.record("llm", (time.perf_counter() - start) * 1000)
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return self._stream(prompt)
+        return _Chunk("".join(chunk.text for chunk in self._stream(prompt)))
+
+
+def synthetic_history(ticker: str, end: pd.Timestamp, days: int) -> pd.DataFrame:
+    """Seeded daily bars ending before `end`, shaped like yfinance history()"""
+    index = pd.bdate_range(end=end.normalize() - pd.Timedelta(days=1), periods=days, tz="America/New_York")
+    seed = int(hashlib.sha256(ticker.encode("utf-8")).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0.0003, 0.015, days))
+    open_ = close * (1 + rng.normal(0, 0.003, days))
+    return pd.DataFrame({
+        "Open": open_, "High": np.maximum(open_, close) * 1.005, "Low": np.minimum(open_, close) * 0.995,
+        "Close": close, "Volume": rng.integers(1e5, 1e7, days).astype(float)
+    }, index=index)
+
+
+class StubYFinance:
+    """The slice of the yfinance module the agents use: Ticker().history() and download()"""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.delay = Delay(profile)
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        self.delay(self.profile.market_ms)
+        result = fn()
+        recorder.record("market_data", (time.perf_counter() - start) * 1000)
+        return result
+
+    def Ticker(self, ticker: str):
+        stub = self
+
+        class _Ticker:
+            def history(self, period: str = None, start=None, **_):
+                # Always the same seeded series, so incremental fetches continue it seamlessly
+                hist = stub._timed(lambda: synthetic_history(ticker, pd.Timestamp.now(tz="America/New_York"), 5 * 252))
+                return hist if start is None else hist[hist.index >= pd.Timestamp(start).tz_localize(hist.index.tz)]
+
+        return _Ticker()
+
+    def download(self, tickers, **_):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        now = pd.Timestamp.now(tz="America/New_York")
+        frames = {ticker: synthetic_history(ticker, now, 1) for ticker in tickers}
+        return self._timed(lambda: pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1))
+
+
+def stub_overview(profile: LatencyProfile):
+    delay = Delay(profile)
+    sectors = ["Technology", "Financials", "Energy", "Health Care", "Industrials"]
+
+    def load_overview(ticker: str) -> dict:
+        start = time.perf_counter()
+        delay(profile.overview_ms)
+        digest = int(hashlib.sha256(ticker.encode("utf-8")).hexdigest()[:8], 16)
+        recorder.record("overview", (time.perf_counter() - start) * 1000)
+        return {"sector": sectors[digest % len(sectors)], "market_cap": str(digest * 1000)}
+
+    return load_overview
+
+
+def timed_stage(stage: str, fn):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            recorder.record(stage, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def timed_stream(stage: str, fn):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        first = True
+        try:
+            async for item in fn(*args, **kwargs):
+                if first:
+                    recorder.record(f"{stage}_first_token", (time.perf_counter() - start) * 1000)
+                    first = False
+                yield item
+        finally:
+            recorder.record(stage, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def stub_agent(agent: str, profile: LatencyProfile):
+    """Swap the external backends of one agent module for stubs; returns the module"""
+    if agent == "retriever":
+        import langchain_community.embeddings
+        langchain_community.embeddings.HuggingFaceEmbeddings = lambda **kwargs: StubEmbeddings(profile)
+        from agents import retriever_agent as module
+    elif agent == "analysis":
+        from data_ingestion import market_data_loader
+        market_data_loader.yf = StubYFinance(profile)
+        from agents import analysis_agent as module
+    elif agent == "language":
+        from agents import language_agent as module
+        module.model = StubGenerativeModel(profile)
+    elif agent == "api":
+        from agents import api_agent as module
+        module.yf = StubYFinance(profile)
+        module.ALPHA_KEY = "stub"
+        module.overview_cache.loader = stub_overview(profile)
+        module.rate_limiter.try_acquire = lambda: True
+    elif agent in ("orchestrator", "monolith"):
+        if agent == "monolith":
+            # Stub the in-process agents before the orchestrator imports them
+            for part in ("retriever", "analysis", "language"):
+                stub_agent(part, profile)
+            os.environ["ORCHESTRATOR_MODE"] = "monolith"
+        from orchestrator import main as module
+        # No backends of its own; time each downstream stage as the orchestrator sees it
+        module.fetch_documents = timed_stage("retrieval", module.fetch_documents)
+        module.fetch_exposure = timed_stage("analysis", module.fetch_exposure)
+        module.fetch_summary = timed_stage("summary", module.fetch_summary)
+        module.stream_summary = timed_stream("summary_stream", module.stream_summary)
+        pack_context = module.pack_context
+
+        def timed_pack(*args, **kwargs):
+            start = time.perf_counter()
+            result = pack_context(*args, **kwargs)
+            recorder.record("packing", (time.perf_counter() - start) * 1000)
+            return result
+
+        module.pack_context = timed_pack
+    else:
+        raise ValueError(f"Unknown agent: {agent}")
+    return module
+
+
+def install_stubs(agent: str, profile: LatencyProfile):
+    """Stub one agent's backends and serve its app; "monolith" is the orchestrator
+    with the retriever, analysis and language agents stubbed in-process.
+
+    Must run before the agent module is imported, since the retriever may
+    build its embedding model at import time (PRELOAD_MODELS=1).
+    """
+    module = stub_agent(agent, profile)
+
+    @module.app.get("/_bench/stages")
+    def bench_stages():
+        return recorder.drain()
+
+    return module.app
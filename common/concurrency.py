@@ -0,0 +1,198 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import asyncio
+import time
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers threads of this process
+    fcntl = None
+
+
+class InstrumentedExecutor:
+    """Bounded thread pool for blocking calls, tracking queue depth and wait/run times"""
+
+    def __init__(self, max_in_flight: int, name: str = "worker"):
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=name)
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.counters = {
+            "completed": 0, "failed": 0,
+            "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0, "run_seconds_max": 0.0
+        }
+
+    def _wrap(self, fn, args):
+        submitted = time.perf_counter()
+        with self.lock:
+            self.queued += 1
+
+        def task():
+            started = time.perf_counter()
+            with self.lock:
+                self.queued -= 1
+                self.running += 1
+                wait = started - submitted
+                self.counters["wait_seconds_total"] += wait
+                self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], wait)
+            ok = False
+            try:
+                result = fn(*args)
+                ok = True
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.running -= 1
+                    self.counters["completed" if ok else "failed"] += 1
+                    self.counters["run_seconds_total"] += elapsed
+                    self.counters["run_seconds_max"] = max(self.counters["run_seconds_max"], elapsed)
+
+        return task
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._wrap(fn, args))
+
+    def submit(self, fn, *args):
+        return self.executor.submit(self._wrap(fn, args))
+
+    def stats(self) -> dict:
+        with self.lock:
+            finished = self.counters["completed"] + self.counters["failed"]
+            return {
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": self.queued,
+                "in_flight": self.running,
+                **self.counters,
+                "wait_seconds_avg": self.counters["wait_seconds_total"] / finished if finished else 0.0,
+                "run_seconds_avg": self.counters["run_seconds_total"] / finished if finished else 0.0
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self.in_flight = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, coro_fn):
+        """Await coro_fn() once per key; callers arriving meanwhile share its result"""
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # Shield so one caller disconnecting doesn't cancel the shared call
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(coro_fn())
+        self.in_flight[key] = future
+        future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {"in_flight_keys": len(self.in_flight), "coalesced": self.coalesced}
+
+
+class Broadcast:
+    """Chunks from one producer, replayed in full to every follower, late joiners included"""
+
+    def __init__(self, on_finish=None):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.on_finish = on_finish
+        self.event = asyncio.Event()
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: BaseException = None):
+        self.finished = True
+        self.error = error
+        if self.on_finish is not None:
+            self.on_finish()
+        self._wake()
+
+    def _wake(self):
+        self.event.set()
+        self.event = asyncio.Event()
+
+    async def follow(self):
+        """Every chunk from the first; raises the producer's error, if any, at the end"""
+        position = 0
+        while True:
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self.event.wait()
+
+
+class StreamFlight:
+    """Coalesces concurrent streams with the same key onto one producer.
+
+    The first caller's start(broadcast) begins producing; it must call
+    broadcast.finish() when done. Callers arriving meanwhile follow the same
+    broadcast, so N identical requests cost one upstream stream.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.coalesced = 0
+
+    def follow(self, key: str, start) -> tuple:
+        """(chunk iterator, whether an in-flight stream was joined)"""
+        broadcast = self.in_flight.get(key)
+        if broadcast is not None:
+            self.coalesced += 1
+            return broadcast.follow(), True
+
+        # Finished streams leave in_flight, so later requests start afresh (or hit a cache)
+        broadcast = self.in_flight[key] = Broadcast(on_finish=lambda: self.in_flight.pop(key, None))
+        start(broadcast)
+        return broadcast.follow(), False
+
+    def stats(self) -> dict:
+        return {"in_flight_streams": len(self.in_flight), "coalesced_streams": self.coalesced}
+
+
+class FileLock:
+    """Exclusive lock across threads and processes (e.g. uvicorn workers), held with
+    flock on a lock file, so writers sharing a directory take turns"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.thread_lock = threading.Lock()
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except BaseException:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        finally:
+            self.fd = None
+            self.thread_lock.release()
@@ -0,0 +1,251 @@
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from common.concurrency import FileLock
+import numpy as np
+import hashlib
+import threading
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "50000"))
+
+
+def text_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class DiskTier:
+    """Append-only float32 matrix (memory-mapped for reads) plus a key index.
+
+    Several processes may share a directory: appends hold a file lock and
+    first pick up rows the others wrote, so row numbers never collide.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.keys_path = os.path.join(path, "keys.txt")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.lock = FileLock(os.path.join(path, ".lock"))
+        self.rows = {}
+        self.n_rows = 0
+        self.keys_offset = 0
+        self.dim = None
+        self._matrix = None
+        os.makedirs(path, exist_ok=True)
+        self._refresh()
+
+    def _refresh(self):
+        """Index rows appended since the last read, by this process or another"""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        try:
+            if os.path.getsize(self.keys_path) <= self.keys_offset:
+                return
+            n_vectors = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            with open(self.keys_path, "rb") as f:
+                f.seek(self.keys_offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        for line in chunk.splitlines(keepends=True):
+            # Vectors are written before keys; a crash can still leave a partial
+            # key line, or a key whose vector was cut short. Stop at either
+            if not line.endswith(b"\n") or self.n_rows >= n_vectors:
+                break
+            self.rows.setdefault(line.decode().strip(), self.n_rows)
+            self.n_rows += 1
+            self.keys_offset += len(line)
+
+    def _view(self):
+        if self._matrix is None or len(self._matrix) < self.n_rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(self.n_rows, self.dim))
+        return self._matrix
+
+    def get(self, key: str):
+        row = self.rows.get(key)
+        if row is None:
+            self._refresh()
+            row = self.rows.get(key)
+            if row is None:
+                return None
+        return self._view()[row].tolist()
+
+    def put_many(self, items: list):
+        with self.lock:
+            self._refresh()
+            items = {key: vector for key, vector in items if key not in self.rows}
+            if not items:
+                return
+            matrix = np.asarray(list(items.values()), dtype=np.float32)
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            keys = "".join(f"{key}\n" for key in items).encode()
+            # Cut any tail an interrupted append left, so rows stay aligned with keys
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(self.n_rows * 4 * self.dim)
+                f.write(matrix.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.truncate(self.keys_offset)
+                f.write(keys)
+            for key in items:
+                self.rows[key] = self.n_rows
+                self.n_rows += 1
+            self.keys_offset += len(keys)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model with an LRU memory tier and a persistent disk tier"""
+
+    def __init__(self, embedder: Embeddings, model_name: str = None,
+                 cache_dir: str = CACHE_DIR, memory_entries: int = MEMORY_ENTRIES):
+        self.embedder = embedder
+        self.model_name = model_name or getattr(embedder, "model_name", None) \
+            or getattr(embedder, "model", None) or type(embedder).__name__
+        self.memory = OrderedDict()
+        self.memory_entries = memory_entries
+        self.disk = None
+        if cache_dir:
+            safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.model_name)
+            try:
+                self.disk = DiskTier(os.path.join(cache_dir, safe_name))
+            except Exception as e:
+                logger.warning(f"Embedding disk cache unavailable: {e}")
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "encode_seconds": 0.0}
+
+    def _remember(self, key: str, vector: list):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key: str):
+        vector = self.memory.get(key)
+        if vector is not None:
+            self.memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.counters["disk_hits"] += 1
+                return vector
+        return None
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [text_key(self.model_name, text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                vector = self._lookup(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    results[i] = vector
+
+        if missing:
+            # Encode each distinct missing text once, in a single batch
+            to_encode = [texts[positions[0]] for positions in missing.values()]
+            start = time.perf_counter()
+            vectors = self.embedder.embed_documents(to_encode)
+            elapsed = time.perf_counter() - start
+
+            with self.lock:
+                self.counters["misses"] += len(to_encode)
+                self.counters["encode_seconds"] += elapsed
+                for (key, positions), vector in zip(missing.items(), vectors):
+                    # Round to float32 so memory and disk hits return identical vectors
+                    vector = np.asarray(vector, dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    for i in positions:
+                        results[i] = vector
+                if self.disk is not None:
+                    try:
+                        self.disk.put_many(list(zip(missing.keys(), vectors)))
+                    except Exception as e:
+                        logger.warning(f"Embedding disk cache write failed: {e}")
+
+        return results
+
+    def embed_query(self, text: str) -> list:
+        key = text_key(self.model_name, "query\0" + text)
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return vector
+
+        start = time.perf_counter()
+        vector = list(self.embedder.embed_query(text))
+        elapsed = time.perf_counter() - start
+
+        # Queries are rarely repeated across restarts, so they stay in memory only
+        with self.lock:
+            self.counters["misses"] += 1
+            self.counters["encode_seconds"] += elapsed
+            self._remember(key, vector)
+        return vector
+
+    def embed_queries(self, texts: list) -> list:
+        """Embed many queries in one batched forward pass (memory tier only)"""
+        keys = [text_key(self.model_name, "query\0" + text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                vector = self.memory.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    results[i] = vector
+
+        if missing:
+            to_encode = [texts[positions[0]] for positions in missing.values()]
+            start = time.perf_counter()
+            vectors = self.embedder.embed_documents(to_encode)
+            elapsed = time.perf_counter() - start
+
+            with self.lock:
+                self.counters["misses"] += len(to_encode)
+                self.counters["encode_seconds"] += elapsed
+                for (key, positions), vector in zip(missing.items(), vectors):
+                    vector = list(vector)
+                    self._remember(key, vector)
+                    for i in positions:
+                        results[i] = vector
+
+        return results
+
+    def stats(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            hits = counters["memory_hits"] + counters["disk_hits"]
+            lookups = hits + counters["misses"]
+            avg_encode = counters["encode_seconds"] / counters["misses"] if counters["misses"] else 0.0
+            return {
+                "model": self.model_name,
+                **counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "estimated_seconds_saved": hits * avg_encode,
+                "memory_entries": len(self.memory),
+                "disk_entries": len(self.disk.rows) if self.disk is not None else 0
+            }
@@ -0,0 +1,323 @@
+from contextvars import ContextVar
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, JSONResponse
+import threading
+import logging
+import time
+import uuid
+import re
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+_TRACE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_METRIC_NAME = re.compile(r"[^a-zA-Z0-9_]")
+_SERVER_TIMING = re.compile(r"([A-Za-z0-9_.:-]+);dur=([0-9.]+)")
+
+# Request-scoped state, set by TraceMiddleware. The timings dict is shared by
+# reference, so stages timed inside gathered tasks land in the same request.
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="")
+timings_var: ContextVar[dict] = ContextVar("timings", default=None)
+service_var: ContextVar[str] = ContextVar("service", default="")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text exposition format"""
+
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = {key: {**series, "buckets": list(series["buckets"])} for key, series in self.series.items()}
+        bucket_names = self.label_names + ("le",)
+        for key, series in sorted(snapshot.items()):
+            for bound, cumulative in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_labels(bucket_names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(bucket_names, key + ('+Inf',))} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Histograms plus gauges read from existing stats() callbacks at scrape time"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.gauge_sources = []
+        self.lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, labels: tuple, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(name, help, labels, buckets)
+            return self.histograms[name]
+
+    def register_stats(self, prefix: str, stats_fn):
+        """Export every numeric field of stats_fn() as a gauge named <prefix>_<field>"""
+        with self.lock:
+            self.gauge_sources.append((_METRIC_NAME.sub("_", prefix), stats_fn))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in list(self.histograms.values()):
+            lines.extend(histogram.render())
+        for prefix, stats_fn in list(self.gauge_sources):
+            try:
+                stats = stats_fn()
+            except Exception:
+                continue
+            for field, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{_METRIC_NAME.sub('_', field)}"
+                lines.extend([f"# TYPE {name} gauge", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streamed bodies",
+    ("service", "method", "route", "status"),
+)
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Latency of named stages within a request", ("service", "stage"),
+)
+
+
+class Readiness:
+    """Startup work (model loads, warm-up inference) that must finish before traffic.
+
+    Each component is pending, ready or failed; the process is ready when
+    every registered component is, and trivially so when none are.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str):
+        with self.lock:
+            self.components.setdefault(name, {"status": "pending"})
+
+    def run_in_background(self, name: str, fn) -> bool:
+        """Run fn once on a daemon thread and mark the component by its outcome"""
+        with self.lock:
+            component = self.components.setdefault(name, {"status": "pending"})
+            if component.get("started"):
+                return False
+            component["started"] = True
+        threading.Thread(target=self._run, args=(name, fn), name=f"warm-up-{name}", daemon=True).start()
+        return True
+
+    def _run(self, name: str, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"Startup component {name} failed: {e}")
+            self._finish(name, "failed", time.perf_counter() - start, error=str(e))
+        else:
+            logger.info(f"Startup component {name} ready in {time.perf_counter() - start:.1f}s")
+            self._finish(name, "ready", time.perf_counter() - start)
+
+    def _finish(self, name: str, status: str, seconds: float, **extra):
+        with self.lock:
+            self.components[name].update(status=status, seconds=seconds, **extra)
+
+    def status(self, prefix: str = "") -> str:
+        """Combined state (ready, starting or failed) of the components named with prefix"""
+        with self.lock:
+            statuses = {c["status"] for name, c in self.components.items() if name.startswith(prefix)}
+        if "failed" in statuses:
+            return "failed"
+        return "starting" if "pending" in statuses else "ready"
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                name: {key: value for key, value in component.items() if key != "started"}
+                for name, component in self.components.items()
+            }
+
+
+readiness = Readiness()
+
+# What /health reports for each readiness state; the orchestrator and the
+# Streamlit app look for "healthy"
+HEALTH_STATUS = {"ready": "healthy", "starting": "starting", "failed": "unhealthy"}
+
+
+class stage:
+    """Time a block as a named stage: `with stage("retrieval"): ...`
+
+    Feeds the stage histogram and, inside a request, that request's timings.
+    Works unchanged around awaits in async code.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        record_stage(self.name, elapsed)
+        return False
+
+
+def record_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, service=service_var.get(), stage=name)
+    timings = timings_var.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+def current_timings() -> dict:
+    """Stage durations in ms recorded so far in this request"""
+    return dict(timings_var.get() or {})
+
+
+def current_trace_id() -> str:
+    return trace_id_var.get()
+
+
+def trace_headers() -> dict:
+    trace_id = trace_id_var.get()
+    return {TRACE_HEADER: trace_id} if trace_id else {}
+
+
+async def propagate_trace(request):
+    """httpx request hook: forward the current trace id to downstream agents"""
+    trace_id = trace_id_var.get()
+    if trace_id:
+        request.headers[TRACE_HEADER] = trace_id
+
+
+def downstream_timings(response, prefix: str):
+    """Fold a downstream agent's Server-Timing header into this request's timings"""
+    timings = timings_var.get()
+    if timings is None:
+        return
+    for name, duration in _SERVER_TIMING.findall(response.headers.get("server-timing", "")):
+        key = f"{prefix}.{name}"
+        timings[key] = timings.get(key, 0.0) + float(duration)
+
+
+class TraceMiddleware:
+    """Pure ASGI middleware: trace id in and out, request histogram, Server-Timing.
+
+    Reuses an incoming X-Trace-Id (so one id follows a brief through every
+    agent) or mints one. Being plain ASGI it times streamed responses to their
+    last byte, which BaseHTTPMiddleware cannot.
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(TRACE_HEADER.lower().encode(), b"").decode("latin-1")
+        trace_id = incoming if _TRACE_ID.match(incoming) else uuid.uuid4().hex
+        timings = {}
+        tokens = (trace_id_var.set(trace_id), timings_var.set(timings), service_var.set(self.service))
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers") or [])
+                headers.append((TRACE_HEADER.lower().encode(), trace_id.encode()))
+                # Stages finished before the first byte, plus time to first byte
+                server_timing = [f"{name};dur={ms:.1f}" for name, ms in timings.items()]
+                server_timing.append(f"app;dur={(time.perf_counter() - start) * 1000:.1f}")
+                headers.append((b"server-timing", ", ".join(server_timing).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                service=self.service,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
+            for var, token in zip((trace_id_var, timings_var, service_var), tokens):
+                var.reset(token)
+
+
+def instrument(app: FastAPI, service: str, health: bool = True):
+    """Add tracing, GET /metrics, liveness and readiness probes and (unless the app
+    has its own) GET /health"""
+    app.add_middleware(TraceMiddleware, service=service)
+
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    def live():
+        # The process is up and serving; restart it only if this stops answering
+        return {"status": "alive", "service": service}
+
+    def ready():
+        # 503 until every startup component has loaded, so no traffic is routed early
+        status = readiness.status()
+        return JSONResponse(
+            content={"status": status, "service": service, "components": readiness.snapshot()},
+            status_code=200 if status == "ready" else 503,
+        )
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/health/live", live, methods=["GET"])
+    app.add_api_route("/health/ready", ready, methods=["GET"])
+
+    if health:
+        def health_check():
+            return {
+                "status": HEALTH_STATUS[readiness.status()],
+                "service": service,
+                "components": readiness.snapshot()
+            }
+
+        app.add_api_route("/health", health_check, methods=["GET"])
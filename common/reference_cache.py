@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+from common.rate_limit import RateLimited
+import threading
+import logging
+import sqlite3
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceDataCache:
+    """Per-field TTL cache with stale-while-revalidate and an optional SQLite backing store.
+
+    Fresh fields are served from memory. Stale fields are still served, but a
+    background refresh is scheduled. Entries older than max_stale_factor * TTL,
+    or missing ones, are loaded synchronously. A load the loader refuses with
+    RateLimited is not waited for: the caller gets the old values (or None
+    values) straight away and the key is retried in the background once the
+    limit allows, with further misses on it served the same way meanwhile.
+    """
+
+    def __init__(self, loader, field_ttls: dict, db_path: str = None,
+                 max_stale_factor: float = 7.0, refresh_workers: int = 2):
+        self.loader = loader
+        self.field_ttls = field_ttls
+        self.max_stale_factor = max_stale_factor
+        self.entries = {}
+        self.refreshing = set()
+        self.retry_at = {}
+        self.lock = threading.Lock()
+        self.retry_wakeup = threading.Condition(self.lock)
+        self.retry_thread = None
+        self.refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers)
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "deferred": 0,
+                         "refreshes": 0, "rate_limited": 0, "load_errors": 0}
+        self.db = None
+        if db_path:
+            try:
+                self._open_db(db_path)
+            except Exception as e:
+                logger.warning(f"Reference cache store unavailable: {e}")
+
+    def _open_db(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS reference_data "
+            "(key TEXT, field TEXT, value TEXT, fetched_at REAL, PRIMARY KEY (key, field))"
+        )
+        for key, field, value, fetched_at in self.db.execute("SELECT * FROM reference_data"):
+            self.entries.setdefault(key, {})[field] = (value, fetched_at)
+
+    def _age_state(self, fields: dict, now: float) -> str:
+        state = "fresh"
+        for field, ttl in self.field_ttls.items():
+            if field not in fields:
+                return "expired"
+            age = now - fields[field][1]
+            if age > ttl * self.max_stale_factor:
+                return "expired"
+            if age > ttl:
+                state = "stale"
+        return state
+
+    def _store(self, key: str, values: dict):
+        now = time.time()
+        with self.lock:
+            fields = self.entries.setdefault(key, {})
+            for field in self.field_ttls:
+                fields[field] = (values.get(field), now)
+            if self.db is not None:
+                try:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO reference_data VALUES (?, ?, ?, ?)",
+                        [(key, field, values.get(field), now) for field in self.field_ttls]
+                    )
+                    self.db.commit()
+                except Exception as e:
+                    logger.warning(f"Reference cache write failed for {key}: {e}")
+
+    def _values(self, key: str) -> dict:
+        return {field: value for field, (value, _) in self.entries.get(key, {}).items()}
+
+    def _defer(self, key: str, retry_after: float):
+        """Queue a rate-limited key for a background retry; caller holds the lock"""
+        self.counters["rate_limited"] += 1
+        self.refreshing.add(key)
+        self.retry_at.pop(key, None)
+        # Re-inserted at the end so throttled keys are retried in arrival order
+        self.retry_at[key] = time.time() + retry_after
+        if self.retry_thread is None:
+            self.retry_thread = threading.Thread(target=self._retry_loop, daemon=True)
+            self.retry_thread.start()
+        self.retry_wakeup.notify()
+
+    def _retry_loop(self):
+        """Hands deferred keys to the refresh pool once their retry time has come"""
+        with self.lock:
+            while True:
+                now = time.time()
+                for key in [key for key, at in self.retry_at.items() if at <= now]:
+                    del self.retry_at[key]
+                    try:
+                        self.refresh_pool.submit(self._refresh, key)
+                    except RuntimeError:
+                        # Interpreter shutting down
+                        return
+                next_at = min(self.retry_at.values(), default=None)
+                self.retry_wakeup.wait(None if next_at is None else next_at - now)
+
+    def _refresh(self, key: str):
+        try:
+            self._store(key, self.loader(key))
+            with self.lock:
+                self.counters["refreshes"] += 1
+        except RateLimited as e:
+            with self.lock:
+                self._defer(key, e.retry_after)
+            return
+        except Exception as e:
+            with self.lock:
+                self.counters["load_errors"] += 1
+            logger.warning(f"Background refresh failed for {key}: {e}")
+        with self.lock:
+            self.refreshing.discard(key)
+
+    def get(self, key: str) -> dict:
+        now = time.time()
+        with self.lock:
+            fields = self.entries.get(key)
+            state = self._age_state(fields, now) if fields else "expired"
+            if state == "fresh":
+                self.counters["fresh_hits"] += 1
+                return self._values(key)
+            if state == "stale":
+                self.counters["stale_hits"] += 1
+                if key not in self.refreshing:
+                    self.refreshing.add(key)
+                    self.refresh_pool.submit(self._refresh, key)
+                return self._values(key)
+            if key in self.refreshing:
+                # Already queued behind the rate limit; don't try it again inline
+                self.counters["deferred"] += 1
+                return self._values(key) or {field: None for field in self.field_ttls}
+            self.counters["misses"] += 1
+
+        try:
+            values = self.loader(key)
+        except RateLimited as e:
+            with self.lock:
+                self._defer(key, e.retry_after)
+                return self._values(key) or {field: None for field in self.field_ttls}
+        except Exception:
+            with self.lock:
+                self.counters["load_errors"] += 1
+                # Better an old answer than none when the provider is unavailable
+                if key in self.entries:
+                    return self._values(key)
+            raise
+        self._store(key, values)
+        return {field: values.get(field) for field in self.field_ttls}
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "entries": len(self.entries), "refreshing": len(self.refreshing),
+                    "retry_queue": len(self.retry_at)}
@@ -0,0 +1,175 @@
+import numpy as np
+import logging
+import shutil
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+# Rows scored per matrix product; bounds search memory independent of shard size
+SEARCH_BLOCK_ROWS = 32768
+
+
+def read_manifest(root: str):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(root: str, manifest: dict):
+    tmp_path = os.path.join(root, f"{MANIFEST}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, MANIFEST))
+
+
+class ShardWriter:
+    """Streams (record, vector) batches into fixed-size shards under root.
+
+    Each shard is built in a .tmp directory and renamed into place before the
+    manifest lists it, so after a crash the manifest only names complete shards
+    and its row total is exactly how many input documents are safely indexed.
+    Nothing larger than one batch is held in memory.
+    """
+
+    def __init__(self, root: str, manifest: dict, shard_size: int):
+        self.root = root
+        self.manifest = manifest
+        self.shard_size = shard_size
+        self.current = None
+        os.makedirs(root, exist_ok=True)
+        # Leftovers of an interrupted run are redone from the manifest position
+        for name in os.listdir(root):
+            if name.endswith(".tmp") and os.path.isdir(os.path.join(root, name)):
+                shutil.rmtree(os.path.join(root, name))
+        write_manifest(root, manifest)
+
+    def _open_shard(self):
+        name = f"shard-{len(self.manifest['shards']):05d}"
+        path = os.path.join(self.root, f"{name}.tmp")
+        os.makedirs(path)
+        self.current = {
+            "name": name,
+            "path": path,
+            "rows": 0,
+            "offset": 0,
+            "files": {
+                part: open(os.path.join(path, part), "wb")
+                for part in ("vectors.f32", "norms.f32", "docs.bin", "offsets.i64")
+            },
+        }
+
+    def _commit_shard(self):
+        shard, files = self.current, self.current["files"]
+        files["offsets.i64"].write(np.int64(shard["offset"]).tobytes())
+        for f in files.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        os.replace(shard["path"], os.path.join(self.root, shard["name"]))
+        self.manifest["shards"].append({"name": shard["name"], "rows": shard["rows"]})
+        self.manifest["rows"] += shard["rows"]
+        write_manifest(self.root, self.manifest)
+        logger.info(f"Committed {shard['name']} ({shard['rows']} rows, {self.manifest['rows']} total)")
+        self.current = None
+
+    def add(self, records: list, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.manifest.get("dim") is None:
+            self.manifest["dim"] = int(vectors.shape[1])
+        elif vectors.shape[1] != self.manifest["dim"]:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} != index dimension {self.manifest['dim']}")
+
+        start = 0
+        while start < len(records):
+            if self.current is None:
+                self._open_shard()
+            take = min(len(records) - start, self.shard_size - self.current["rows"])
+            block = vectors[start:start + take]
+            files = self.current["files"]
+            files["vectors.f32"].write(block.tobytes())
+            files["norms.f32"].write(np.einsum("ij,ij->i", block, block).astype(np.float32).tobytes())
+            for record in records[start:start + take]:
+                payload = json.dumps(record, ensure_ascii=False).encode("utf-8")
+                files["offsets.i64"].write(np.int64(self.current["offset"]).tobytes())
+                files["docs.bin"].write(payload)
+                self.current["offset"] += len(payload)
+            self.current["rows"] += take
+            start += take
+            if self.current["rows"] >= self.shard_size:
+                self._commit_shard()
+
+    def close(self, complete: bool = True):
+        if self.current is not None and self.current["rows"]:
+            self._commit_shard()
+        self.manifest["complete"] = complete
+        write_manifest(self.root, self.manifest)
+
+
+class ShardedIndex:
+    """Read-only, memory-mapped view of an index written by ShardWriter.
+
+    Vectors, norms and the docstore stay in the page cache rather than the
+    process heap, so opening is near-instant and replicas share the memory.
+    Search is exact L2, same as the in-memory FAISS collections.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest = read_manifest(root)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No {MANIFEST} in {root}")
+        self.dim = self.manifest.get("dim")
+        self.model = self.manifest.get("model")
+        self.shards = []
+        for entry in self.manifest["shards"]:
+            path, rows = os.path.join(root, entry["name"]), entry["rows"]
+            self.shards.append({
+                "vectors": np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim)),
+                "norms": np.memmap(os.path.join(path, "norms.f32"), dtype=np.float32, mode="r", shape=(rows,)),
+                "offsets": np.memmap(os.path.join(path, "offsets.i64"), dtype=np.int64, mode="r", shape=(rows + 1,)),
+                "docs": np.memmap(os.path.join(path, "docs.bin"), dtype=np.uint8, mode="r")
+                if os.path.getsize(os.path.join(path, "docs.bin")) else np.empty(0, dtype=np.uint8),
+            })
+        self.starts = np.cumsum([0] + [entry["rows"] for entry in self.manifest["shards"]])
+        self.ntotal = int(self.starts[-1])
+
+    def nbytes(self) -> int:
+        return sum(shard["vectors"].nbytes + shard["docs"].nbytes for shard in self.shards)
+
+    def document(self, position: int) -> dict:
+        shard_number = int(np.searchsorted(self.starts, position, "right")) - 1
+        shard = self.shards[shard_number]
+        row = position - int(self.starts[shard_number])
+        lo, hi = int(shard["offsets"][row]), int(shard["offsets"][row + 1])
+        return json.loads(bytes(shard["docs"][lo:hi]).decode("utf-8"))
+
+    def search(self, queries: np.ndarray, k: int):
+        """Exact top-k by L2 distance; returns (distances, positions), each (n_queries, k)"""
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        k = min(k, self.ntotal)
+        if k == 0:
+            return np.empty((len(queries), 0), np.float32), np.empty((len(queries), 0), np.int64)
+
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        candidate_distances, candidate_positions = [], []
+        for shard, start in zip(self.shards, self.starts):
+            for lo in range(0, len(shard["norms"]), SEARCH_BLOCK_ROWS):
+                block = shard["vectors"][lo:lo + SEARCH_BLOCK_ROWS]
+                # ||v - q||^2 = ||v||^2 - 2 v.q + ||q||^2, rows x queries
+                distances = shard["norms"][lo:lo + SEARCH_BLOCK_ROWS, None] - 2 * (block @ queries.T) + query_norms
+                top = min(k, len(distances))
+                rows = np.argpartition(distances, top - 1, axis=0)[:top]
+                candidate_distances.append(np.take_along_axis(distances, rows, axis=0))
+                candidate_positions.append(rows + start + lo)
+
+        distances = np.concatenate(candidate_distances)
+        positions = np.concatenate(candidate_positions)
+        order = np.argsort(distances, axis=0, kind="stable")[:k]
+        distances = np.maximum(np.take_along_axis(distances, order, axis=0), 0)
+        return distances.T, np.take_along_axis(positions, order, axis=0).T
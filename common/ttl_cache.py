@@ -0,0 +1,80 @@
+from collections import OrderedDict
+import threading
+import logging
+import sqlite3
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Size-bounded LRU cache with per-entry TTL and an optional SQLite persistent tier"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, db_path: str = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self.db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+                )
+            except Exception as e:
+                logger.warning(f"Persistent cache unavailable: {e}")
+                self.db = None
+
+    def _remember(self, key: str, value, stored_at: float):
+        self.entries[key] = (value, stored_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def get(self, key: str):
+        """Cached value or None if missing or expired"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl_seconds:
+                    self.entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[0]
+                del self.entries[key]
+                self.counters["expired"] += 1
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.counters["disk_hits"] += 1
+                    return value
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self.lock:
+            self._remember(key, value, now)
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, json.dumps(value), now)
+                    )
+                    self.db.execute("DELETE FROM cache WHERE stored_at < ?", (now - self.ttl_seconds,))
+                    self.db.commit()
+                except Exception as e:
+                    logger.warning(f"Persistent cache write failed: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "entries": len(self.entries), "max_entries": self.max_entries}
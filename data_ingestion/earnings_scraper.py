@@ -1,17 +1,147 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import json
+import os
+import httpx
+from lxml import html
+
+BASE_URL = os.getenv("YAHOO_FINANCE_URL", "https://finance.yahoo.com")
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "8"))
+
+# Rows of Yahoo's "Earnings History" table, mapped to output fields
+HISTORY_ROWS = {
+    "eps est.": "eps_estimate",
+    "eps actual": "eps_actual",
+    "difference": "difference",
+    "surprise %": "surprise_pct",
+}
+
+
+def parse_number(text: str):
+    """'1.23' -> 1.23, '12.5%' -> 12.5, '1,234' -> 1234.0, 'N/A'/'--' -> None"""
+    cleaned = text.strip().replace(",", "").replace("%", "").replace("+", "")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def _table_rows(table) -> list:
+    return [
+        [cell.text_content().strip() for cell in row.xpath("./th|./td")]
+        for row in table.xpath(".//tr")
+    ]
+
+
+def parse_analysis_page(page: str) -> dict:
+    """Structured estimate/actual/surprise fields from a Yahoo analysis page.
+
+    Only the tables holding "EPS Actual" or "Avg. Estimate" rows are visited,
+    via XPath over lxml's C parser, instead of scanning every table's text.
+    """
+    tree = html.fromstring(page)
+    quarters, avg_estimate = [], {}
+
+    history = tree.xpath("//table[.//td[normalize-space()='EPS Actual'] or .//th[normalize-space()='EPS Actual']]")
+    if history:
+        rows = _table_rows(history[0])
+        periods = rows[0][1:]
+        quarters = [{"period": period} for period in periods]
+        for row in rows[1:]:
+            field = HISTORY_ROWS.get(row[0].lower()) if row else None
+            if field:
+                for quarter, value in zip(quarters, row[1:]):
+                    quarter[field] = parse_number(value)
+
+    estimate = tree.xpath("//table[.//td[normalize-space()='Avg. Estimate'] or .//th[normalize-space()='Avg. Estimate']]")
+    if estimate:
+        rows = _table_rows(estimate[0])
+        periods = rows[0][1:]
+        for row in rows[1:]:
+            if row and row[0] == "Avg. Estimate":
+                avg_estimate = {period: parse_number(value) for period, value in zip(periods, row[1:])}
+
+    reported = [quarter for quarter in quarters if quarter.get("eps_actual") is not None]
+    return {
+        "quarters": quarters,
+        "latest": reported[-1] if reported else None,
+        "avg_estimate": avg_estimate
+    }
+
+
+class EarningsScraper:
+    """Bulk scraper with a pooled client, bounded concurrency and ETag/Last-Modified revalidation"""
+
+    def __init__(self, base_url: str = BASE_URL, max_concurrency: int = MAX_CONCURRENCY,
+                 cache_path: str = None, timeout: float = 15.0):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.cache = {}
+        self.counters = {"fetched": 0, "not_modified": 0, "errors": 0}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.cache = json.load(f)
+
+    def _save_cache(self):
+        if self.cache_path:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.cache, f)
+            os.replace(tmp_path, self.cache_path)
+
+    async def _fetch(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, ticker: str) -> dict:
+        url = f"{self.base_url}/quote/{ticker}/analysis"
+        cached = self.cache.get(ticker)
+        headers = dict(HEADERS)
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            async with semaphore:
+                response = await client.get(url, params={"p": ticker}, headers=headers)
+
+            if response.status_code == 304 and cached:
+                self.counters["not_modified"] += 1
+                return {"ticker": ticker, **cached["parsed"], "cached": True}
+
+            response.raise_for_status()
+            # Parsing is CPU-bound, keep it off the event loop
+            parsed = await asyncio.to_thread(parse_analysis_page, response.text)
+            self.counters["fetched"] += 1
+            self.cache[ticker] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "parsed": parsed
+            }
+            return {"ticker": ticker, **parsed, "cached": False}
+
+        except Exception as e:
+            self.counters["errors"] += 1
+            if cached:
+                return {"ticker": ticker, **cached["parsed"], "cached": True, "error": str(e)}
+            return {"ticker": ticker, "quarters": [], "latest": None, "avg_estimate": {}, "error": str(e)}
+
+    async def scrape(self, tickers: list) -> dict:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True) as client:
+            results = await asyncio.gather(*(self._fetch(client, semaphore, ticker) for ticker in tickers))
+        self._save_cache()
+        return {result["ticker"]: result for result in results}
+
+
+def get_earnings_surprises(tickers: list, **kwargs) -> dict:
+    """Scrape many tickers concurrently; returns {ticker: structured earnings data}"""
+    return asyncio.run(EarningsScraper(**kwargs).scrape(tickers))
+
 
 def get_earnings_surprise(ticker: str):
-    url = f"https://finance.yahoo.com/quote/{ticker}/analysis?p={ticker}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    page = requests.get(url, headers=headers)
-    soup = BeautifulSoup(page.text, 'html.parser')
-
-    tables = soup.find_all('table')
-    for table in tables:
-        if "Earnings Estimate" in table.text:
-            rows = table.find_all("tr")
-            data = [row.text for row in rows if "Avg. Estimate" in row.text]
-            return {"ticker": ticker, "surprise_info": data}
-
-    return {"ticker": ticker, "surprise_info": "Not found"}
\ No newline at end of file
+    result = get_earnings_surprises([ticker])[ticker]
+    result["surprise_info"] = result["latest"] or "Not found"
+    return result
@@ -0,0 +1,20 @@
+import numpy as np
+
+# Set per worker process by init_worker, so each process loads the model once
+_model = None
+
+
+def init_worker(model_name: str, threads: int = 0):
+    global _model
+    if threads:
+        # N processes each using every core just thrash; split the cores between them
+        import torch
+        torch.set_num_threads(threads)
+    from sentence_transformers import SentenceTransformer
+    _model = SentenceTransformer(model_name)
+
+
+def embed_batch(texts: list) -> np.ndarray:
+    # Same settings as HuggingFaceEmbeddings' defaults, so the retriever's query vectors match
+    return _model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                         show_progress_bar=False).astype(np.float32)
@@ -1,10 +1,214 @@
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
+from common.embedding_cache import CachedEmbeddings
+from common.sharded_index import ShardWriter, read_manifest
+from data_ingestion import embedding_worker
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import itertools
+import argparse
+import hashlib
+import logging
+import shutil
+import json
+import time
+import os
 
-def build_index(texts: list):
-    embedder = OpenAIEmbeddings()
+logger = logging.getLogger(__name__)
+
+# Must match the retriever's query model for the vectors to be comparable
+MODEL_NAME = os.getenv("INDEXER_MODEL", "all-MiniLM-L6-v2")
+BATCH_SIZE = int(os.getenv("INDEXER_BATCH_SIZE", "256"))
+SHARD_SIZE = int(os.getenv("INDEXER_SHARD_SIZE", "20000"))
+WORKERS = int(os.getenv("INDEXER_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSAGE_CHARS = int(os.getenv("INDEXER_PASSAGE_CHARS", "2000"))
+SUFFIXES = (".txt", ".md", ".jsonl")
+
+def build_index(texts: list, embedder=None):
+    # Imported here: only this in-memory path uses them, not the bulk CLI
+    from langchain.embeddings import OpenAIEmbeddings
+    from langchain.vectorstores import FAISS
+    embedder = embedder or CachedEmbeddings(OpenAIEmbeddings())
     index = FAISS.from_texts(texts, embedding=embedder)
     return index
 
 def retrieve(index, query: str, k: int = 3):
-    return index.similarity_search(query, k=k)
\ No newline at end of file
+    return index.similarity_search(query, k=k)
+
+
+def list_sources(paths: list) -> list:
+    """Supported files under the given files/directories, in a stable order (resume relies on it)"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                sources.extend(os.path.join(directory, name) for name in names if name.endswith(SUFFIXES))
+        elif path.endswith(SUFFIXES):
+            sources.append(path)
+    return sorted(os.path.abspath(source) for source in sources)
+
+
+def iter_passages(path: str, passage_chars: int = PASSAGE_CHARS):
+    """Yield (id, text) from one file, reading it line by line.
+
+    .jsonl lines are records with "text" and an optional "id"; text files are
+    split on blank lines, with short paragraphs packed up to passage_chars.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("text"):
+                        yield record.get("id"), record["text"]
+            return
+
+        passage, paragraph = "", []
+        for line in itertools.chain(f, [""]):
+            if line.strip():
+                paragraph.append(line.strip())
+                continue
+            text = " ".join(paragraph)
+            paragraph = []
+            if not text:
+                continue
+            if passage and len(passage) + len(text) + 1 > passage_chars:
+                yield None, passage
+                passage = ""
+            passage = f"{passage} {text}" if passage else text
+            while len(passage) > passage_chars:
+                yield None, passage[:passage_chars]
+                passage = passage[passage_chars:]
+        if passage:
+            yield None, passage
+
+
+def iter_documents(sources: list, passage_chars: int = PASSAGE_CHARS):
+    for source in sources:
+        for doc_id, text in iter_passages(source, passage_chars):
+            yield {
+                "id": doc_id or hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                "source": source,
+                "text": text
+            }
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def embed_batches(batches, model_name: str = MODEL_NAME, workers: int = WORKERS, embedder=None):
+    """Yield (batch, vectors) in input order.
+
+    With workers > 0 batches are embedded across spawned processes, each with its
+    own copy of the model; at most 2 batches per worker are in flight, which keeps
+    memory flat however long the input is. An Embeddings object runs in-process.
+    """
+    if embedder is not None:
+        for batch in batches:
+            yield batch, embedder.embed_documents([doc["text"] for doc in batch])
+        return
+
+    if workers <= 0:
+        embedding_worker.init_worker(model_name)
+        for batch in batches:
+            yield batch, embedding_worker.embed_batch([doc["text"] for doc in batch])
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=embedding_worker.init_worker,
+        initargs=(model_name, threads),
+    ) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(embedding_worker.embed_batch, [doc["text"] for doc in batch])))
+            if len(pending) >= workers * 2:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+
+def embedder_name(embedder) -> str:
+    """Identifier recorded in the manifest for an in-process Embeddings object"""
+    return getattr(embedder, "model_name", None) or getattr(embedder, "model", None) or type(embedder).__name__
+
+
+def index_corpus(paths: list, out_dir: str, model_name: str = MODEL_NAME, batch_size: int = BATCH_SIZE,
+                 shard_size: int = SHARD_SIZE, workers: int = WORKERS, passage_chars: int = PASSAGE_CHARS,
+                 embedder=None, restart: bool = False) -> dict:
+    """Embed every passage under paths into a sharded on-disk index at out_dir.
+
+    Re-running after an interruption resumes after the last committed shard;
+    the corpus is re-read up to that point but nothing is re-embedded. Resuming
+    with a different model, corpus or vector dimension is refused.
+    """
+    start = time.perf_counter()
+    sources = list_sources(paths)
+    model = embedder_name(embedder) if embedder is not None else model_name
+    settings = {"model": model, "sources": sources, "passage_chars": passage_chars}
+
+    manifest = read_manifest(out_dir)
+    if manifest is not None and (restart or {key: manifest.get(key) for key in settings} != settings):
+        if not restart:
+            raise ValueError(f"{out_dir} was built from a different corpus or model; pass restart=True to rebuild")
+        shutil.rmtree(out_dir)
+        manifest = None
+    if manifest is not None and manifest.get("complete"):
+        logger.info(f"{out_dir} is already complete ({manifest['rows']} rows)")
+        return {"status": "complete", "rows": manifest["rows"], "added": 0, "shards": len(manifest["shards"]), "seconds": 0.0}
+
+    manifest = manifest or {**settings, "dim": None, "shards": [], "rows": 0, "complete": False}
+    resumed_at = manifest["rows"]
+    if resumed_at:
+        logger.info(f"Resuming {out_dir} after {resumed_at} indexed passages")
+
+    writer = ShardWriter(out_dir, manifest, shard_size)
+    documents = itertools.islice(iter_documents(sources, passage_chars), resumed_at, None)
+    for batch, vectors in embed_batches(batched(documents, batch_size), model_name, workers, embedder):
+        # The dimension is only known once something is embedded; check it before anything is written
+        if manifest["dim"] is not None and len(vectors[0]) != manifest["dim"]:
+            raise ValueError(f"{out_dir} holds {manifest['dim']}-dimensional vectors but {model} returns "
+                             f"{len(vectors[0])}; pass restart=True to rebuild")
+        writer.add(batch, vectors)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    added = manifest["rows"] - resumed_at
+    logger.info(f"Indexed {added} passages into {out_dir} in {elapsed:.1f}s")
+    return {
+        "status": "complete",
+        "rows": manifest["rows"],
+        "added": added,
+        "resumed_at": resumed_at,
+        "shards": len(manifest["shards"]),
+        "seconds": elapsed,
+        "passages_per_second": added / elapsed if elapsed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a sharded, memory-mappable index from text/markdown/jsonl files")
+    parser.add_argument("paths", nargs="+", help="files or directories to index")
+    parser.add_argument("--out", required=True, help="index directory, e.g. data/sharded_index/<collection>")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="embedding processes; 0 embeds in-process")
+    parser.add_argument("--passage-chars", type=int, default=PASSAGE_CHARS)
+    parser.add_argument("--restart", action="store_true", help="discard an existing index and rebuild")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = index_corpus(args.paths, args.out, args.model, args.batch_size, args.shard_size,
+                          args.workers, args.passage_chars, restart=args.restart)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,86 @@
 import yfinance as yf
+import pandas as pd
+from data_ingestion.ohlcv_store import OHLCVStore
+import re
+import os
+
+# Depth of the first download for a ticker with no stored history
+INITIAL_PERIOD = "5y"
+# A ticker synced more recently than this is not fetched again. Daily bars
+# complete once per session, whatever the exchange's timezone or calendar,
+# so weekends and holidays cost one upstream call per interval, not per read
+SYNC_INTERVAL = pd.Timedelta(seconds=float(os.getenv("OHLCV_SYNC_INTERVAL_SECONDS", "3600")))
+
+_PERIOD = re.compile(r"(\d+)(d|wk|mo|y)")
+_PERIOD_OFFSETS = {"wk": "weeks", "mo": "months", "y": "years"}
+
+store = OHLCVStore()
+
+
+def completed_bars(hist: pd.DataFrame) -> pd.DataFrame:
+    """Drop today's still-forming bar so the append-only store only holds final bars"""
+    if hist.empty:
+        return hist
+    today = pd.Timestamp.now(tz=hist.index.tz).normalize()
+    return hist[hist.index.normalize() < today]
+
+
+def sync_ticker(ticker: str, max_age: pd.Timedelta = SYNC_INTERVAL) -> int:
+    """Fetch only bars newer than the last stored one and append them"""
+    now = pd.Timestamp.now(tz="UTC")
+    synced = store.synced_at(ticker)
+    if synced is not None and now - synced < max_age:
+        return 0
 
-def load_market_data(ticker: str):
     ticker_obj = yf.Ticker(ticker)
-    return ticker_obj.history(period="5d")
\ No newline at end of file
+    last = store.last_timestamp(ticker)
+    if last is None:
+        hist = ticker_obj.history(period=INITIAL_PERIOD)
+    else:
+        hist = ticker_obj.history(start=(last + pd.Timedelta(days=1)).date())
+    added = store.append(ticker, completed_bars(hist))
+    store.mark_synced(ticker, now)
+    return added
+
+
+def sync_tickers(tickers: list, max_age: pd.Timedelta = SYNC_INTERVAL) -> dict:
+    return {ticker: sync_ticker(ticker, max_age) for ticker in tickers}
+
+
+def load_history(tickers: list, start=None, end=None, refresh: bool = True) -> dict:
+    """Zero-copy column views per ticker from the local store, syncing new bars first"""
+    if refresh:
+        sync_tickers(tickers)
+    return store.read_many(tickers, start, end)
+
+
+def select_period(frame: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Bars within a yfinance period: "5d" is the last 5 sessions, "1mo"/"1y" calendar spans"""
+    if period == "max":
+        return frame
+    now = pd.Timestamp.now(tz="UTC")
+    if period == "ytd":
+        return frame[frame.index >= now.normalize().replace(month=1, day=1)]
+    match = _PERIOD.fullmatch(period)
+    if not match:
+        raise ValueError(f"Invalid period: {period!r}")
+    count, unit = int(match[1]), match[2]
+    if unit == "d":
+        return frame.iloc[-count:] if count else frame.iloc[:0]
+    return frame[frame.index >= now.normalize() - pd.DateOffset(**{_PERIOD_OFFSETS[unit]: count})]
+
+
+def load_market_data(ticker: str, period: str = "5d", refresh: bool = True):
+    """Daily bars over a yfinance period; with refresh, the current session's
+    still-forming bar is fetched live and included, as yfinance would"""
+    if refresh:
+        sync_ticker(ticker)
+    frame = store.to_frame(ticker)
+    if refresh:
+        latest = yf.Ticker(ticker).history(period="1d")
+        if not latest.empty:
+            latest = latest[["Open", "High", "Low", "Close", "Volume"]].tz_convert("UTC")
+            latest.index.name = frame.index.name
+            newer = latest[latest.index > frame.index[-1]] if len(frame) else latest
+            frame = pd.concat([frame, newer])
+    return select_period(frame, period)
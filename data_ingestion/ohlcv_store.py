@@ -0,0 +1,157 @@
+from common.concurrency import FileLock
+import threading
+import numpy as np
+import pandas as pd
+import os
+
+STORE_DIR = os.getenv("OHLCV_STORE_DIR", "data/ohlcv")
+COLUMNS = {
+    "timestamp": np.int64,  # bar open, ns since epoch (UTC)
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+}
+
+
+class OHLCVStore:
+    """Append-only columnar bar store: one raw NumPy file per column per ticker.
+
+    Reads are np.memmap views, so range reads across many tickers copy nothing.
+    Rows are only ever appended in timestamp order, which keeps existing maps valid.
+    Appends take a per-ticker file lock, so several processes can share a store.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+
+    def _dir(self, ticker: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_.^=" else "_" for c in ticker.upper())
+        return os.path.join(self.root, safe)
+
+    def _path(self, ticker: str, column: str) -> str:
+        return os.path.join(self._dir(ticker), f"{column}.bin")
+
+    def _lock(self, ticker: str) -> FileLock:
+        with self.locks_guard:
+            key = ticker.upper()
+            if key not in self.locks:
+                self.locks[key] = FileLock(os.path.join(self._dir(ticker), ".lock"))
+            return self.locks[key]
+
+    def tickers(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(os.path.join(self.root, name, "timestamp.bin")))
+
+    def rows(self, ticker: str) -> int:
+        path = self._path(ticker, "timestamp")
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def last_timestamp(self, ticker: str):
+        """Timestamp of the newest stored bar, or None if the ticker has no history"""
+        n_rows = self.rows(ticker)
+        if not n_rows:
+            return None
+        stamps = np.memmap(self._path(ticker, "timestamp"), dtype=np.int64, mode="r", shape=(n_rows,))
+        return pd.Timestamp(int(stamps[-1]), unit="ns", tz="UTC")
+
+    def append(self, ticker: str, bars: pd.DataFrame) -> int:
+        """Append bars newer than the last stored one; returns how many were written"""
+        if bars is None or bars.empty:
+            return 0
+        index = pd.DatetimeIndex(bars.index)
+        index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+        stamps = index.as_unit("ns").asi8
+
+        with self._lock(ticker):
+            last = self.last_timestamp(ticker)
+            keep = stamps > last.value if last is not None else np.ones(len(stamps), dtype=bool)
+            if not keep.any():
+                return 0
+            order = np.argsort(stamps[keep], kind="stable")
+
+            # Drop any tail left by an interrupted append; it lies past every reader's
+            # map, and no other writer can be mid-append while we hold the lock
+            n_rows = self.rows(ticker)
+            for column in columns_of_data():
+                path = self._path(ticker, column)
+                if os.path.exists(path) and os.path.getsize(path) > n_rows * 8:
+                    os.truncate(path, n_rows * 8)
+
+            columns = {
+                "open": bars["Open"], "high": bars["High"], "low": bars["Low"],
+                "close": bars["Close"], "volume": bars["Volume"],
+            }
+            # Data columns first, timestamp last: the timestamp file defines the row count,
+            # so an interrupted append never exposes a partial row
+            for column, series in columns.items():
+                with open(self._path(ticker, column), "ab") as f:
+                    f.write(np.asarray(series, dtype=COLUMNS[column])[keep][order].tobytes())
+            with open(self._path(ticker, "timestamp"), "ab") as f:
+                f.write(stamps[keep][order].tobytes())
+            return int(keep.sum())
+
+    def synced_at(self, ticker: str):
+        """When the ticker was last synced from upstream, or None if never"""
+        try:
+            with open(os.path.join(self._dir(ticker), "synced_at")) as f:
+                return pd.Timestamp(int(f.read()), unit="ns", tz="UTC")
+        except (OSError, ValueError):
+            return None
+
+    def mark_synced(self, ticker: str, when: pd.Timestamp):
+        path = os.path.join(self._dir(ticker), "synced_at")
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        os.makedirs(self._dir(ticker), exist_ok=True)
+        with open(temp, "w") as f:
+            f.write(str(when.value))
+        os.replace(temp, path)
+
+    def read(self, ticker: str, start=None, end=None, columns: list = None) -> dict:
+        """Zero-copy column views for bars in [start, end); timestamp is always included"""
+        columns = {column: COLUMNS[column] for column in ["timestamp", *(columns or COLUMNS)]}
+        n_rows = self.rows(ticker)
+        if not n_rows:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in columns.items()}
+        stamps = np.memmap(self._path(ticker, "timestamp"), dtype=np.int64, mode="r", shape=(n_rows,))
+        lo = np.searchsorted(stamps, _to_ns(start), "left") if start is not None else 0
+        hi = np.searchsorted(stamps, _to_ns(end), "left") if end is not None else n_rows
+        return {
+            column: (stamps if column == "timestamp" else
+                     np.memmap(self._path(ticker, column), dtype=dtype, mode="r", shape=(n_rows,)))[lo:hi]
+            for column, dtype in columns.items()
+        }
+
+    def read_many(self, tickers: list, start=None, end=None, columns: list = None) -> dict:
+        return {ticker: self.read(ticker, start, end, columns) for ticker in tickers}
+
+    def close_matrix(self, tickers: list, start=None, end=None) -> pd.DataFrame:
+        """Close prices aligned on timestamp, one column per ticker (copies, for analytics)"""
+        series = {}
+        for ticker, bars in self.read_many(tickers, start, end, ["close"]).items():
+            series[ticker] = pd.Series(bars["close"], index=pd.to_datetime(bars["timestamp"], unit="ns", utc=True))
+        return pd.DataFrame(series)
+
+    def to_frame(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        bars = self.read(ticker, start, end)
+        return pd.DataFrame(
+            {
+                "Open": bars["open"], "High": bars["high"], "Low": bars["low"],
+                "Close": bars["close"], "Volume": bars["volume"],
+            },
+            index=pd.DatetimeIndex(pd.to_datetime(bars["timestamp"], unit="ns", utc=True), name="Date"),
+        )
+
+
+def columns_of_data() -> list:
+    return [column for column in COLUMNS if column != "timestamp"]
+
+
+def _to_ns(value) -> int:
+    stamp = pd.Timestamp(value)
+    stamp = stamp.tz_localize("UTC") if stamp.tz is None else stamp.tz_convert("UTC")
+    return stamp.as_unit("ns").value
@@ -0,0 +1,150 @@
+from common.sse import aiter_events
+from common.instrumentation import downstream_timings, readiness, HEALTH_STATUS
+import httpx
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEPLOYMENT_MODES = ("distributed", "monolith")
+
+
+async def check_health(client: httpx.AsyncClient, url: str, timeout: float) -> str:
+    try:
+        res = await client.get(f"{url}/health", timeout=timeout)
+        status = res.json().get("status") if res.status_code == 200 else None
+        # "starting" while the agent is still loading its models
+        return status if status in ("healthy", "starting") else "unhealthy"
+    except Exception:
+        return "unreachable"
+
+
+class HttpBackend:
+    """Retriever, analysis and language agents as separate services (distributed mode)"""
+
+    mode = "distributed"
+
+    def __init__(self, client: httpx.AsyncClient, retriever_url: str, analysis_url: str, language_url: str):
+        self.client = client
+        self.urls = {
+            "retriever_agent": retriever_url,
+            "analysis_agent": analysis_url,
+            "language_agent": language_url,
+        }
+
+    async def index(self, texts: list, collection: str) -> dict:
+        index_res = await self.client.post(
+            f"{self.urls['retriever_agent']}/index",
+            json={"texts": texts, "collection": collection},
+        )
+        downstream_timings(index_res, "retriever.index")
+        logger.info(f"Index response: {index_res.status_code}")
+        return index_res.json() if index_res.status_code == 200 else {"status": "error"}
+
+    async def retrieve(self, query: str, k: int, collection: str) -> list:
+        retrieve_res = await self.client.get(
+            f"{self.urls['retriever_agent']}/retrieve",
+            params={"query": query, "k": k, "collection": collection},
+        )
+        downstream_timings(retrieve_res, "retriever.retrieve")
+        if retrieve_res.status_code == 200:
+            return retrieve_res.json().get("results", [])
+        return []
+
+    async def risk_exposure(self, portfolio: dict) -> dict:
+        exposure_res = await self.client.post(f"{self.urls['analysis_agent']}/risk_exposure", json={"portfolio": portfolio})
+        downstream_timings(exposure_res, "analysis")
+        if exposure_res.status_code == 200:
+            return exposure_res.json()
+        return {"error": f"Analysis service returned {exposure_res.status_code}"}
+
+    async def summarize(self, context: str, question: str) -> str:
+        summary_res = await self.client.post(
+            f"{self.urls['language_agent']}/generate_summary",
+            json={"context": context, "question": question},
+        )
+        downstream_timings(summary_res, "language")
+        logger.info(f"Summary service status: {summary_res.status_code}")
+
+        if summary_res.status_code == 200:
+            return summary_res.json().get("summary", "No summary generated")
+        return f"Summary service error: {summary_res.status_code}"
+
+    async def stream_summary(self, context: str, question: str, timeout: float):
+        """Summary text chunks; timeout bounds the wait for each chunk"""
+        async with self.client.stream(
+            "POST",
+            f"{self.urls['language_agent']}/generate_summary/stream",
+            json={"context": context, "question": question},
+            timeout=httpx.Timeout(timeout, connect=5.0),
+        ) as summary_res:
+            summary_res.raise_for_status()
+            async for event, data in aiter_events(summary_res.aiter_lines()):
+                if event == "token":
+                    yield data["text"]
+
+    async def health(self, timeout: float) -> dict:
+        statuses = await asyncio.gather(*(check_health(self.client, url, timeout) for url in self.urls.values()))
+        return dict(zip(self.urls.keys(), statuses))
+
+
+class LocalBackend:
+    """The same agents imported into this process and called as functions (monolith mode).
+
+    No localhost hops or JSON round trips; blocking agent code runs on the
+    default thread pool, which carries the request's trace context along.
+    Agents import lazily, so distributed deployments never load their models.
+    """
+
+    mode = "monolith"
+
+    def __init__(self):
+        from agents import retriever_agent, analysis_agent, language_agent
+        self.retriever = retriever_agent
+        self.analysis = analysis_agent
+        self.language = language_agent
+        # Imported modules get no startup event of their own
+        self.retriever.start_warm_up()
+
+    async def index(self, texts: list, collection: str) -> dict:
+        result = await asyncio.to_thread(self.retriever.index_texts, texts, collection)
+        logger.info(f"Index result: {result.get('status')}")
+        return result
+
+    async def retrieve(self, query: str, k: int, collection: str) -> list:
+        result = await asyncio.to_thread(self.retriever.retrieve, query, k, collection)
+        return result.get("results", [])
+
+    async def risk_exposure(self, portfolio: dict) -> dict:
+        try:
+            return await asyncio.to_thread(self.analysis.exposure_report, {"portfolio": portfolio})
+        except Exception as e:
+            logger.error(f"Error in exposure_report: {e}")
+            return {"error": f"Analysis error: {str(e)}"}
+
+    async def summarize(self, context: str, question: str) -> str:
+        summary, _, _ = await self.language.summarize(context, question)
+        return summary
+
+    async def stream_summary(self, context: str, question: str, timeout: float):
+        """Summary text chunks; timeout bounds the wait for each chunk"""
+        key, cached = self.language.cached_summary(context, question)
+        events = self.language.summary_events(context, question, key, cached)
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                if event == "token":
+                    yield data["text"]
+        finally:
+            await events.aclose()
+
+    async def health(self, timeout: float) -> dict:
+        # In-process agents are up whenever this process is, once the retriever's model has loaded
+        return {
+            "retriever_agent": HEALTH_STATUS[readiness.status("retriever.")],
+            "analysis_agent": "healthy",
+            "language_agent": "healthy"
+        }
@@ -0,0 +1,92 @@
+import math
+import re
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Near-duplicate passages share at least this fraction of word 3-shingles
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English prose)"""
+    return math.ceil(len(text) / 4)
+
+
+def _shingles(words: list, size: int = 3) -> set:
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _truncate(text: str, budget: int) -> str:
+    """Longest prefix of whole sentences within the token budget, else a hard cut"""
+    kept = ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{kept} {sentence}".strip()
+        if estimate_tokens(candidate) > budget:
+            break
+        kept = candidate
+    return kept or text[:budget * 4]
+
+
+def pack_context(passages: list, query: str, token_budget: int, min_fragment_tokens: int = 32):
+    """Score, dedupe and trim retrieved passages to fit the token budget.
+
+    Passages are assumed to arrive in retriever rank order. Each score combines
+    that rank with the share of query terms the passage contains. Returns the
+    packed passages (best first) and a stats dict.
+    """
+    query_terms = {word.lower() for word in _WORD.findall(query)}
+    tokens_in = sum(estimate_tokens(passage) for passage in passages)
+
+    seen_exact, kept_shingles, candidates = set(), [], []
+    duplicates = 0
+    for rank, passage in enumerate(passages):
+        normalized = " ".join(passage.split()).lower()
+        if not normalized or normalized in seen_exact:
+            duplicates += bool(normalized)
+            continue
+        words = _WORD.findall(normalized)
+        shingles = _shingles(words)
+        if any(_jaccard(shingles, other) >= NEAR_DUPLICATE_THRESHOLD for other in kept_shingles):
+            duplicates += 1
+            continue
+        seen_exact.add(normalized)
+        kept_shingles.append(shingles)
+
+        overlap = len(query_terms & set(words)) / len(query_terms) if query_terms else 0.0
+        candidates.append((1.0 / (1 + rank) + overlap, rank, passage))
+
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+
+    packed, used, truncated, dropped = [], 0, 0, 0
+    for _, _, passage in candidates:
+        tokens = estimate_tokens(passage)
+        remaining = token_budget - used
+        if tokens <= remaining:
+            packed.append(passage)
+            used += tokens
+        elif remaining >= min_fragment_tokens:
+            fragment = _truncate(passage, remaining)
+            packed.append(fragment)
+            used += estimate_tokens(fragment)
+            truncated += 1
+        else:
+            dropped += 1
+
+    return packed, {
+        "passages_in": len(passages),
+        "passages_out": len(packed),
+        "duplicates_removed": duplicates,
+        "truncated": truncated,
+        "dropped": dropped,
+        "tokens_in": tokens_in,
+        "tokens_out": used,
+        "tokens_saved": tokens_in - used,
+        "token_budget": token_budget
+    }
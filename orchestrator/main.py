@@ -48,104 +48,202 @@
 #     }
 
 from fastapi import FastAPI, Request
-import requests
+from fastapi.responses import StreamingResponse
+from common.sse import format_event
+from common.instrumentation import (
+    instrument, stage, record_stage, propagate_trace, current_timings, current_trace_id
+)
+from orchestrator.context_packing import pack_context
+from orchestrator.backends import DEPLOYMENT_MODES, HttpBackend, LocalBackend, check_health
+import httpx
+import asyncio
+import hashlib
 import logging
+import time
+import os
 import json
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RETRIEVER_URL = os.getenv("RETRIEVER_URL", "http://localhost:8002")
+ANALYSIS_URL = os.getenv("ANALYSIS_URL", "http://localhost:8003")
+LANGUAGE_URL = os.getenv("LANGUAGE_URL", "http://localhost:8004")
+# Not on the brief path, only health-checked
+API_URL = os.getenv("API_URL", "http://localhost:8001")
+VOICE_URL = os.getenv("VOICE_URL", "http://localhost:8006")
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "2"))
+
+# "distributed": retriever, analysis and language agents are separate HTTP
+# services. "monolith": they are imported and called in this process, for
+# single-box deployments; the URLs above are then unused.
+DEPLOYMENT_MODE = os.getenv("ORCHESTRATOR_MODE", "distributed")
+if DEPLOYMENT_MODE not in DEPLOYMENT_MODES:
+    raise ValueError(f"ORCHESTRATOR_MODE must be one of {DEPLOYMENT_MODES}, got {DEPLOYMENT_MODE!r}")
+
+# Per-call deadlines in seconds; can be overridden per request via "timeouts"
+DEFAULT_TIMEOUTS = {
+    "retriever": float(os.getenv("RETRIEVER_TIMEOUT", "10")),
+    "analysis": float(os.getenv("ANALYSIS_TIMEOUT", "10")),
+    "language": float(os.getenv("LANGUAGE_TIMEOUT", "30")),
+}
+
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "3"))
+# Token budget for the context sent to the language agent
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
 app = FastAPI()
+instrument(app, "orchestrator", health=False)
+
+# Shared pooled client and agent backend, created once per worker
+client: httpx.AsyncClient = None
+backend = None
+
+
+@app.on_event("startup")
+async def startup():
+    global client, backend
+    client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        # Every downstream call carries this request's trace id
+        event_hooks={"request": [propagate_trace]},
+    )
+    if DEPLOYMENT_MODE == "monolith":
+        backend = LocalBackend()
+    else:
+        backend = HttpBackend(client, RETRIEVER_URL, ANALYSIS_URL, LANGUAGE_URL)
+    logger.info(f"Orchestrator running in {DEPLOYMENT_MODE} mode")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if client is not None:
+        await client.aclose()
+
+
+async def fetch_documents(query: str, texts: list, collection: str, timeout: float, k: int = RETRIEVER_K) -> list:
+    """Index the context texts into the collection and retrieve the top documents"""
+    if not texts:
+        return ["No context documents provided"]
+
+    try:
+        async def _call():
+            with stage("retrieval.index"):
+                await backend.index(texts, collection)
+            with stage("retrieval.search"):
+                return await backend.retrieve(query, k, collection)
+
+        with stage("retrieval"):
+            return await asyncio.wait_for(_call(), timeout=timeout)
+
+    except asyncio.TimeoutError:
+        logger.error(f"Retriever timed out after {timeout}s")
+        return [f"Retriever service timed out after {timeout}s"]
+    except Exception as e:
+        logger.error(f"Retriever error: {e}")
+        return [f"Retriever service unavailable: {str(e)}"]
+
+
+async def fetch_exposure(portfolio: dict, timeout: float) -> dict:
+    """Ask the analysis agent for the portfolio risk exposure"""
+    try:
+        with stage("analysis"):
+            return await asyncio.wait_for(backend.risk_exposure(portfolio), timeout=timeout)
+
+    except asyncio.TimeoutError:
+        logger.error(f"Analysis timed out after {timeout}s")
+        return {"error": f"Analysis service timed out after {timeout}s"}
+    except Exception as e:
+        logger.error(f"Analysis error: {e}")
+        return {"error": f"Analysis service unavailable: {str(e)}"}
+
+
+async def fetch_summary(documents: list, query: str, timeout: float) -> str:
+    """Ask the language agent to summarize the retrieved documents"""
+    try:
+        summary_context = "\n".join(documents) if documents else "No context available"
+        with stage("summary"):
+            return await asyncio.wait_for(backend.summarize(summary_context, query), timeout=timeout)
+
+    except asyncio.TimeoutError:
+        logger.error(f"Summary timed out after {timeout}s")
+        return f"Summary service timed out after {timeout}s"
+    except Exception as e:
+        logger.error(f"Summary error: {e}")
+        return f"Summary service unavailable: {str(e)}"
+
+
+async def stream_summary(documents: list, query: str, timeout: float):
+    """Yield summary text chunks from the language agent as it generates them"""
+    summary_context = "\n".join(documents) if documents else "No context available"
+    start = time.perf_counter()
+    first = True
+    with stage("summary"):
+        async for text in backend.stream_summary(summary_context, query, timeout):
+            if first:
+                record_stage("summary.first_token", time.perf_counter() - start)
+                first = False
+            yield text
+
+
+def parse_brief(body: dict):
+    query = body.get("query", "")
+    portfolio = body.get("portfolio", {})
+    context = body.get("context", "")
+    texts = body.get("texts", [context] if context else [])
+    timeouts = {**DEFAULT_TIMEOUTS, **body.get("timeouts", {})}
+    # Isolate each context in its own retriever collection; identical
+    # contexts share one, so repeat briefs skip re-embedding
+    collection = body.get("collection") or "brief-" + hashlib.sha256(
+        "\n".join(texts).encode("utf-8")
+    ).hexdigest()[:16]
+    token_budget = int(body.get("context_budget", CONTEXT_TOKEN_BUDGET))
+    return query, portfolio, texts, collection, timeouts, token_budget
+
+
+def timings_block(start: float) -> dict:
+    """Per-stage breakdown of this request, returned when the caller asks for timings"""
+    return {
+        "trace_id": current_trace_id(),
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "stages_ms": current_timings()
+    }
+
 
 @app.post("/brief")
 async def generate_brief(request: Request):
+    start = time.perf_counter()
     try:
         body = await request.json()
-        query = body.get("query", "")
-        portfolio = body.get("portfolio", {})
-        context = body.get("context", "")
-        texts = body.get("texts", [context] if context else [])
+        query, portfolio, texts, collection, timeouts, token_budget = parse_brief(body)
         
-        logger.info(f"Received request - Query: {query}, Portfolio keys: {list(portfolio.keys())}")
-
-        # Initialize response components
-        documents = []
-        exposure_data = {}
-        summary = ""
-
-        # Retriever Agent
-        try:
-            if texts:
-                index_res = requests.post(
-                    "http://localhost:8002/index", 
-                    json={"texts": texts},
-                    timeout=10
-                )
-                logger.info(f"Index response: {index_res.status_code}")
-                
-                retrieve_res = requests.get(
-                    "http://localhost:8002/retrieve", 
-                    params={"query": query, "k": 3},
-                    timeout=10
-                )
-                if retrieve_res.status_code == 200:
-                    documents = retrieve_res.json().get("results", [])
-            else:
-                documents = ["No context documents provided"]
-                
-        except Exception as e:
-            logger.error(f"Retriever error: {e}")
-            documents = [f"Retriever service unavailable: {str(e)}"]
+        logger.info(f"[{current_trace_id()}] Received request - Query: {query}, Portfolio keys: {list(portfolio.keys())}")
 
-        # Analysis Agent
-        try:
-            exposure_res = requests.post(
-                "http://localhost:8003/risk_exposure", 
-                json={"portfolio": portfolio},
-                timeout=10
-            )
-            if exposure_res.status_code == 200:
-                exposure_data = exposure_res.json()
-            else:
-                exposure_data = {"error": f"Analysis service returned {exposure_res.status_code}"}
-                
-        except Exception as e:
-            logger.error(f"Analysis error: {e}")
-            exposure_data = {"error": f"Analysis service unavailable: {str(e)}"}
+        # Retriever and Analysis agents are independent, so run them concurrently
+        documents, exposure_data = await asyncio.gather(
+            fetch_documents(query, texts, collection, timeouts["retriever"]),
+            fetch_exposure(portfolio, timeouts["analysis"]),
+        )
 
-        # Language Agent (Gemini)
-        try:
-            summary_context = "\n".join(documents) if documents else "No context available"
-            summary_res = requests.post(
-                "http://localhost:8004/generate_summary", 
-                json={
-                    "context": summary_context,
-                    "question": query
-                },
-                timeout=30
-            )
-            
-            logger.info(f"Summary service status: {summary_res.status_code}")
-            
-            if summary_res.status_code == 200:
-                summary_data = summary_res.json()
-                summary = summary_data.get("summary", "No summary generated")
-            else:
-                summary = f"Summary service error: {summary_res.status_code}"
-                
-        except Exception as e:
-            logger.error(f"Summary error: {e}")
-            summary = f"Summary service unavailable: {str(e)}"
+        # Language Agent (Gemini) depends on the retrieved documents, packed to the token budget
+        with stage("packing"):
+            packed, context_stats = pack_context(documents, query, token_budget)
+        logger.info(f"Context packed: {context_stats['tokens_saved']} tokens saved")
+        summary = await fetch_summary(packed, query, timeouts["language"])
 
         response = {
             "documents": documents,
             "exposure": exposure_data,
             "summary": summary,
+            "context_stats": context_stats,
             "query": query,
             "status": "success"
         }
+        if body.get("timings") or request.query_params.get("timings"):
+            response["timings"] = timings_block(start)
         
-        logger.info("Response generated successfully")
+        logger.info(f"[{current_trace_id()}] Response generated in {(time.perf_counter() - start) * 1000:.0f} ms")
         return response
         
     except Exception as e:
@@ -153,4 +251,80 @@ async def generate_brief(request: Request):
         return {
             "error": f"Service error: {str(e)}",
             "status": "error"
-        }
\ No newline at end of file
+        }
+
+
+@app.post("/brief/stream")
+async def generate_brief_stream(request: Request):
+    """Server-sent events: "documents" and "exposure" as each agent finishes,
+    "token" events while the summary streams, then "done" with the full brief."""
+    start = time.perf_counter()
+    body = await request.json()
+    query, portfolio, texts, collection, timeouts, token_budget = parse_brief(body)
+    want_timings = body.get("timings") or request.query_params.get("timings")
+    logger.info(f"[{current_trace_id()}] Received streaming request - Query: {query}, Portfolio keys: {list(portfolio.keys())}")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    result = {"query": query}
+
+    async def retrieve_then_summarize():
+        documents = await fetch_documents(query, texts, collection, timeouts["retriever"])
+        with stage("packing"):
+            packed, context_stats = pack_context(documents, query, token_budget)
+        result["documents"] = documents
+        result["context_stats"] = context_stats
+        await queue.put(("documents", {"documents": documents, "context_stats": context_stats}))
+
+        parts = []
+        try:
+            async for text in stream_summary(packed, query, timeouts["language"]):
+                parts.append(text)
+                await queue.put(("token", {"text": text}))
+            result["summary"] = "".join(parts) or "No summary generated"
+        except Exception as e:
+            logger.error(f"Summary stream error: {e}")
+            result["summary"] = "".join(parts) or f"Summary service unavailable: {str(e)}"
+            if not parts:
+                await queue.put(("token", {"text": result["summary"]}))
+
+    async def analyze():
+        result["exposure"] = await fetch_exposure(portfolio, timeouts["analysis"])
+        await queue.put(("exposure", {"exposure": result["exposure"]}))
+
+    async def events():
+        producers = [asyncio.create_task(retrieve_then_summarize()), asyncio.create_task(analyze())]
+        done = asyncio.gather(*producers)
+        done.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield format_event(*item)
+            await done
+            if want_timings:
+                result["timings"] = timings_block(start)
+            yield format_event("done", {**result, "status": "success"})
+        except Exception as e:
+            logger.error(f"Streaming orchestrator error: {e}")
+            yield format_event("error", {"error": f"Service error: {str(e)}", "status": "error"})
+        finally:
+            for task in producers:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/health")
+async def health():
+    """Orchestrator liveness plus the status of every agent it depends on"""
+    api_status, brief_statuses, voice_status = await asyncio.gather(
+        check_health(client, API_URL, HEALTH_TIMEOUT),
+        backend.health(HEALTH_TIMEOUT),
+        check_health(client, VOICE_URL, HEALTH_TIMEOUT),
+    )
+    return {
+        "status": "healthy",
+        "mode": DEPLOYMENT_MODE,
+        "services": {"api_agent": api_status, **brief_statuses, "voice_agent": voice_status}
+    }
@@ -9,8 +9,14 @@ import sys
 import os
 import signal
 from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-import requests
+import argparse
+from requests.adapters import HTTPAdapter
+
+BRIEF_CACHE_TTL_SECONDS = int(os.getenv("BRIEF_CACHE_TTL_SECONDS", "120"))
+AUTO_REFRESH_SECONDS = 300
+AUTO_REFRESH_CHECK_SECONDS = 30
 
 # Page configuration
 st.set_page_config(
@@ -19,6 +25,16 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One pooled keep-alive session for every script run and browser tab"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 st.title("📈 Morning Market Brief Assistant")
 st.markdown("*Multi-Agent Finance Assistant with Voice & Text I/O*")
 
@@ -30,7 +46,7 @@ with st.sidebar:
     st.header("📊 Service Status")
     if st.button("Check Health"):
         try:
-            health_response = requests.get(f"{orchestrator_url}/health", timeout=5)
+            health_response = http_session().get(f"{orchestrator_url}/health", timeout=5)
             if health_response.status_code == 200:
                 health_data = health_response.json()
                 st.success("Orchestrator: ✅ Healthy")
@@ -38,6 +54,8 @@ with st.sidebar:
                 for service, status in health_data.get("services", {}).items():
                     if status == "healthy":
                         st.success(f"{service}: ✅ Healthy")
+                    elif status == "starting":
+                        st.info(f"{service}: ⏳ Loading models")
                     elif status == "unhealthy":
                         st.warning(f"{service}: ⚠️ Unhealthy")
                     else:
@@ -117,9 +135,196 @@ with col2:
     if st.button("🗣️ Enable Voice Output"):
         st.info("TTS will be enabled in response")
 
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a streaming server-sent events response"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+@st.cache_data(ttl=BRIEF_CACHE_TTL_SECONDS, max_entries=256, show_spinner=False)
+def cached_brief(url: str, query: str, portfolio_json: str, context: str, _brief: dict = None) -> dict:
+    """Recent briefs, shared by every session. Looking one up raises KeyError on a
+    miss (exceptions are not cached); passing _brief stores it under the request."""
+    if _brief is None:
+        raise KeyError("brief not cached")
+    return _brief
+
+
+def show_documents(placeholder, documents: list):
+    if documents:
+        with placeholder.container():
+            st.header("📚 Source Documents")
+            with st.expander("View Retrieved Context"):
+                for i, doc in enumerate(documents, 1):
+                    st.markdown(f"**Document {i}:**")
+                    st.text(doc)
+
+
+def show_exposure(placeholder, exposure):
+    if exposure:
+        with placeholder.container():
+            st.header("⚖️ Risk Exposure Analysis")
+            if isinstance(exposure, dict):
+                st.info(exposure.get("exposure") or exposure.get("error", "No exposure data"))
+            else:
+                st.info(exposure)
+
+
+def show_market_data(placeholder, market_data: dict):
+    if market_data:
+        with placeholder.container():
+            st.header("📈 Market Data")
+
+            # Create columns for market data
+            cols = st.columns(min(len(market_data), 3))
+            for i, (ticker, ticker_data) in enumerate(market_data.items()):
+                with cols[i % 3]:
+                    if "error" not in ticker_data:
+                        st.metric(
+                            label=f"{ticker}",
+                            value=f"${ticker_data.get('current_price', 'N/A'):.2f}" if ticker_data.get('current_price') else "N/A",
+                            delta=f"{ticker_data.get('change_pct', 0):.2f}%" if ticker_data.get('change_pct') else None
+                        )
+                        st.caption(f"Sector: {ticker_data.get('sector', 'N/A')}")
+                    else:
+                        st.error(f"{ticker}: Data unavailable")
+
+
+def show_details(placeholder, data: dict):
+    with placeholder.container():
+        stages = (data.get("timings") or {}).get("stages_ms")
+        if stages:
+            with st.expander("⏱️ Stage Timings"):
+                st.table({"stage": list(stages.keys()), "ms": [round(ms, 1) for ms in stages.values()]})
+        # Raw response (for debugging)
+        with st.expander("🔍 Raw API Response"):
+            st.json(data)
+
+
+# Stages of a brief, in the order the progress checklist lists them
+STAGES = {
+    "documents": ("📚 Retrieving context", "📚 Context retrieved"),
+    "exposure": ("⚖️ Analysing exposure", "⚖️ Exposure analysed"),
+    "summary": ("📝 Writing summary", "📝 Summary written"),
+}
+
+
+def stage_checklist(finished: dict, started: float) -> str:
+    lines = []
+    for stage, (pending, done) in STAGES.items():
+        if stage in finished:
+            lines.append(f"✅ {done} — {finished[stage] - started:.1f}s")
+        else:
+            lines.append(f"⏳ {pending}...")
+    return "  \n".join(lines)
+
+
+def generate_brief(request: dict):
+    """Render a brief, from the cache if an identical one is recent, else streamed
+    section by section as each agent finishes"""
+    key = (orchestrator_url, request["query"], json.dumps(request["portfolio"], sort_keys=True), request["context"])
+
+    st.header("📝 Executive Summary")
+    summary_placeholder = st.empty()
+    exposure_placeholder = st.empty()
+    documents_placeholder = st.empty()
+    market_placeholder = st.empty()
+    details_placeholder = st.empty()
+
+    try:
+        data = cached_brief(*key)
+    except KeyError:
+        data = None
+    if data is not None:
+        summary_placeholder.markdown(data.get("summary") or "No summary available")
+        show_exposure(exposure_placeholder, data.get("exposure"))
+        show_documents(documents_placeholder, data.get("documents"))
+        show_market_data(market_placeholder, data.get("market_data"))
+        show_details(details_placeholder, data)
+        st.caption(f"⚡ Served from cache, generated at {data.get('generated_at', 'N/A')}")
+        return
+
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    status_text.text("📡 Contacting orchestrator...")
+
+    started = time.perf_counter()
+    finished = {}
+    summary = ""
+    data = {}
+
+    def advance(stage: str):
+        finished.setdefault(stage, time.perf_counter())
+        progress_bar.progress(len(finished) / len(STAGES))
+        status_text.markdown(stage_checklist(finished, started))
+
+    try:
+        response = http_session().post(
+            f"{orchestrator_url}/brief/stream",
+            json={**request, "timings": True},
+            stream=True,
+            timeout=(5, 30)
+        )
+
+        if response.status_code != 200:
+            st.error(f"❌ API Error: {response.status_code}")
+            st.text(response.text)
+            return
+
+        status_text.markdown(stage_checklist(finished, started))
+        for event, payload in iter_sse(response):
+            if event == "documents":
+                show_documents(documents_placeholder, payload.get("documents"))
+                advance("documents")
+
+            elif event == "exposure":
+                show_exposure(exposure_placeholder, payload.get("exposure"))
+                advance("exposure")
+
+            elif event == "token":
+                summary += payload.get("text", "")
+                summary_placeholder.markdown(summary + "▌")
+
+            elif event == "done":
+                data = payload
+                summary_placeholder.markdown(data.get("summary") or summary or "No summary available")
+                advance("summary")
+
+            elif event == "error":
+                st.error(f"❌ {payload.get('error', 'Unknown error')}")
+
+        if data:
+            st.success(f"📊 Market Brief Generated Successfully in {time.perf_counter() - started:.1f}s!")
+            show_market_data(market_placeholder, data.get("market_data"))
+            show_details(details_placeholder, data)
+            data["generated_at"] = datetime.now().strftime("%H:%M:%S")
+            cached_brief(*key, _brief=data)
+
+    except requests.exceptions.Timeout:
+        st.error("⏰ Request timed out. Please check if all services are running.")
+    except requests.exceptions.ConnectionError:
+        st.error("🔌 Connection failed. Please verify the orchestrator URL and service status.")
+    except Exception as e:
+        st.error(f"❌ Unexpected error: {str(e)}")
+    finally:
+        # Clear progress indicators
+        progress_bar.empty()
+        status_text.empty()
+
+
 # Generate brief button
 st.markdown("---")
-if st.button("🚀 Generate Market Brief", type="primary", use_container_width=True):
+generate_clicked = st.button("🚀 Generate Market Brief", type="primary", use_container_width=True)
+if generate_clicked:
     
     # Validate inputs
     try:
@@ -131,95 +336,13 @@ if st.button("🚀 Generate Market Brief", type="primary", use_container_width=T
     if not query.strip():
         st.error("❌ Please enter a market question")
         st.stop()
-    
-    # Show loading
-    with st.spinner("🔄 Generating market brief..."):
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        try:
-            # Update progress
-            status_text.text("📡 Contacting orchestrator...")
-            progress_bar.progress(20)
-            
-            # Make request to orchestrator
-            response = requests.post(
-                f"{orchestrator_url}/brief",
-                json={
-                    "query": query,
-                    "portfolio": portfolio,
-                    "context": context
-                },
-                timeout=30
-            )
-            
-            progress_bar.progress(60)
-            status_text.text("🤖 Processing with AI agents...")
-            
-            if response.status_code == 200:
-                data = response.json()
-                progress_bar.progress(100)
-                status_text.text("✅ Brief generated successfully!")
-                
-                # Display results
-                st.success("📊 Market Brief Generated Successfully!")
-                
-                # Main summary
-                st.header("📝 Executive Summary")
-                summary = data.get("summary", "No summary available")
-                st.markdown(summary)
-                
-                # Risk exposure
-                if data.get("exposure"):
-                    st.header("⚖️ Risk Exposure Analysis")
-                    st.info(data["exposure"])
-                
-                # Market data
-                if data.get("market_data"):
-                    st.header("📈 Market Data")
-                    market_data = data["market_data"]
-                    
-                    # Create columns for market data
-                    if market_data:
-                        cols = st.columns(min(len(market_data), 3))
-                        for i, (ticker, ticker_data) in enumerate(market_data.items()):
-                            with cols[i % 3]:
-                                if "error" not in ticker_data:
-                                    st.metric(
-                                        label=f"{ticker}",
-                                        value=f"${ticker_data.get('current_price', 'N/A'):.2f}" if ticker_data.get('current_price') else "N/A",
-                                        delta=f"{ticker_data.get('change_pct', 0):.2f}%" if ticker_data.get('change_pct') else None
-                                    )
-                                    st.caption(f"Sector: {ticker_data.get('sector', 'N/A')}")
-                                else:
-                                    st.error(f"{ticker}: Data unavailable")
-                
-                # Retrieved documents
-                if data.get("documents"):
-                    st.header("📚 Source Documents")
-                    with st.expander("View Retrieved Context"):
-                        for i, doc in enumerate(data["documents"], 1):
-                            st.markdown(f"**Document {i}:**")
-                            st.text(doc)
-                
-                # Raw response (for debugging)
-                with st.expander("🔍 Raw API Response"):
-                    st.json(data)
-                    
-            else:
-                st.error(f"❌ API Error: {response.status_code}")
-                st.text(response.text)
-                
-        except requests.exceptions.Timeout:
-            st.error("⏰ Request timed out. Please check if all services are running.")
-        except requests.exceptions.ConnectionError:
-            st.error("🔌 Connection failed. Please verify the orchestrator URL and service status.")
-        except Exception as e:
-            st.error(f"❌ Unexpected error: {str(e)}")
-        finally:
-            # Clear progress indicators
-            progress_bar.empty()
-            status_text.empty()
+
+    # Remembered so auto-refresh can regenerate the same brief
+    st.session_state["brief_request"] = {"query": query, "portfolio": portfolio, "context": context}
+
+if generate_clicked or st.session_state.pop("refresh_due", False):
+    st.session_state["brief_at"] = time.time()
+    generate_brief(st.session_state["brief_request"])
 
 # Footer
 st.markdown("---")
@@ -233,26 +356,74 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+
+@st.fragment(run_every=AUTO_REFRESH_CHECK_SECONDS)
+def auto_refresh():
+    """Re-run the last brief once it is AUTO_REFRESH_SECONDS old. The timer lives in
+    the browser, so no script thread is held between checks."""
+    brief_at = st.session_state.get("brief_at")
+    if not brief_at or "brief_request" not in st.session_state:
+        st.caption("Generate a brief to start auto-refresh")
+        return
+    remaining = AUTO_REFRESH_SECONDS - (time.time() - brief_at)
+    if remaining <= 0:
+        st.session_state["refresh_due"] = True
+        st.rerun()
+    st.caption(f"Next refresh in {int(remaining // 60)}:{int(remaining % 60):02d}")
+
+
 # Auto-refresh option
 if st.checkbox("🔄 Auto-refresh every 5 minutes"):
-    time.sleep(300)  # 5 minutes
-    st.experimental_rerun()
+    auto_refresh()
+
+
 
+# Seconds a service must stay up before its restart backoff resets
+STABLE_SECONDS = 60
 
 
 class ServiceManager:
-    def __init__(self):
+    def __init__(self, production: bool = False, workers: int = 1, monolith: bool = False,
+                 host: str = "0.0.0.0", log_dir: str = "logs"):
         self.services = {
-            "api_agent": {"port": 8001, "file": "agents/api_agent.py", "process": None},
-            "retriever_agent": {"port": 8002, "file": "agents/retriever_agent.py", "process": None},
-            "analysis_agent": {"port": 8003, "file": "agents/analysis_agent.py", "process": None},
-            "language_agent": {"port": 8004, "file": "agents/language_agent.py", "process": None},
-            "orchestrator": {"port": 8005, "file": "orchestrator/main.py", "process": None},
-            "voice_agent": {"port": 8006, "file": "agents/voice_agent.py", "process": None},
-            "scraping_agent": {"port": 8007, "file": "agents/scraping_agent.py", "process": None}
+            # Each worker would have its own Alpha Vantage token bucket, multiplying the quota
+            "api_agent": {"port": 8001, "file": "agents/api_agent.py", "max_workers": 1},
+            # Collections live in process memory, so /index and /retrieve must hit the same worker
+            "retriever_agent": {"port": 8002, "file": "agents/retriever_agent.py", "max_workers": 1},
+            # One process owns the OHLCV store's upstream syncs and the cached risk models
+            "analysis_agent": {"port": 8003, "file": "agents/analysis_agent.py", "max_workers": 1},
+            "language_agent": {"port": 8004, "file": "agents/language_agent.py"},
+            "orchestrator": {"port": 8005, "file": "orchestrator/main.py"},
+            "voice_agent": {"port": 8006, "file": "agents/voice_agent.py"},
         }
+        if monolith:
+            # Retriever, analysis and language agents run inside the orchestrator
+            for name in ("retriever_agent", "analysis_agent", "language_agent"):
+                del self.services[name]
+            self.services["orchestrator"].update(max_workers=1, env={"ORCHESTRATOR_MODE": "monolith"})
+        for config in self.services.values():
+            config.update(process=None, restarts=0, failures=0, started_at=None, restart_at=None)
+
+        self.production = production
+        self.workers = workers
+        self.host = host
+        self.log_dir = log_dir
+        self.lock = threading.Lock()
         self.running = True
 
+    def command(self, config: Dict) -> List[str]:
+        args = [
+            sys.executable, "-m", "uvicorn",
+            config['file'].replace('/', '.').replace('.py', '') + ":app",
+            "--host", self.host,
+            "--port", str(config['port']),
+        ]
+        if self.production:
+            args += ["--workers", str(min(self.workers, config.get("max_workers", self.workers)))]
+        else:
+            args.append("--reload")
+        return args
+
     def start_service(self, name: str, config: Dict) -> bool:
         """Start a single service"""
         try:
@@ -263,16 +434,17 @@ class ServiceManager:
                 print(f"❌ Error: {config['file']} not found!")
                 return False
             
-            # Start the service
-            process = subprocess.Popen([
-                sys.executable, "-m", "uvicorn",
-                config['file'].replace('/', '.').replace('.py', '') + ":app",
-                "--host", "0.0.0.0",
-                "--port", str(config['port']),
-                "--reload"
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # Output goes to a file; an unread pipe would block the service once full
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(os.path.join(self.log_dir, f"{name}.log"), "ab") as log:
+                # Own process group, so uvicorn's workers can be stopped with it
+                process = subprocess.Popen(
+                    self.command(config), stdout=log, stderr=subprocess.STDOUT,
+                    env={**os.environ, **config.get("env", {})}, start_new_session=True
+                )
             
             config['process'] = process
+            config['started_at'] = time.monotonic()
             print(f"✅ {name} started with PID {process.pid}")
             return True
             
@@ -280,43 +452,60 @@ class ServiceManager:
             print(f"❌ Failed to start {name}: {str(e)}")
             return False
 
+    def signal_group(self, process: subprocess.Popen, sig: int):
+        """Signal a service and its workers, which outlive a killed uvicorn master"""
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
     def check_service_health(self, name: str, port: int) -> bool:
-        """Check if a service is responding"""
+        """Check if a service is ready for traffic (models loaded and warmed up)"""
         try:
-            response = requests.get(f"http://localhost:{port}/docs", timeout=2)
+            response = requests.get(f"http://localhost:{port}/health/ready", timeout=2)
             return response.status_code == 200
-        except:
+        except requests.exceptions.RequestException:
             return False
 
-    def start_all_services(self):
-        """Start all services"""
+    def wait_until_ready(self, name: str, config: Dict, timeout: float):
+        """Seconds until the service reported ready, or None if it exited or timed out"""
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            process = config['process']
+            if process is None or process.poll() is not None:
+                return None
+            if self.check_service_health(name, config['port']):
+                return time.monotonic() - start
+            time.sleep(0.1)
+        return None
+
+    def start_all_services(self, timeout: float = 120.0):
+        """Launch every service at once, then poll each until it is ready"""
         print("🏁 Starting Finance Assistant Multi-Agent System...")
+        mode = f"production, {self.workers} workers" if self.production else "development, --reload"
+        print(f"   Mode: {mode}")
         print("=" * 60)
         
-        success_count = 0
-        for name, config in self.services.items():
-            if self.start_service(name, config):
-                success_count += 1
-            time.sleep(2)  # Give each service time to start
+        cold_start = time.monotonic()
+        started = {name: config for name, config in self.services.items() if self.start_service(name, config)}
         
-        print("\n" + "=" * 60)
-        print(f"✅ Started {success_count}/{len(self.services)} services")
-        
-        # Wait for services to be ready
         print("\n⏳ Waiting for services to be ready...")
-        time.sleep(5)
-        
-        # Check health
-        print("\n🏥 Health Check:")
-        healthy_services = 0
-        for name, config in self.services.items():
-            if self.check_service_health(name, config['port']):
-                print(f"✅ {name}: Healthy")
-                healthy_services += 1
-            else:
-                print(f"❌ {name}: Not responding")
+        ready_after = {}
+        with ThreadPoolExecutor(max_workers=max(len(started), 1)) as pool:
+            futures = {pool.submit(self.wait_until_ready, name, config, timeout): name for name, config in started.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                ready_after[name] = future.result()
+                if ready_after[name] is not None:
+                    print(f"✅ {name}: Ready in {ready_after[name]:.1f}s")
+                else:
+                    print(f"❌ {name}: Not responding")
+        cold_start = time.monotonic() - cold_start
         
-        print(f"\n📊 {healthy_services}/{len(self.services)} services are healthy")
+        healthy_services = sum(1 for seconds in ready_after.values() if seconds is not None)
+        print("\n" + "=" * 60)
+        print(f"📊 {healthy_services}/{len(self.services)} services are healthy")
+        print(f"⏱️  Cold start: {cold_start:.1f}s")
         
         if healthy_services > 0:
             print("\n🎉 Finance Assistant is ready!")
@@ -332,30 +521,52 @@ class ServiceManager:
     def stop_all_services(self):
         """Stop all running services"""
         print("\n🛑 Stopping all services...")
-        self.running = False
+        with self.lock:
+            self.running = False
         
         for name, config in self.services.items():
-            if config['process']:
+            if config['process'] and config['process'].poll() is None:
                 try:
-                    config['process'].terminate()
+                    self.signal_group(config['process'], signal.SIGTERM)
                     config['process'].wait(timeout=5)
                     print(f"✅ Stopped {name}")
                 except subprocess.TimeoutExpired:
-                    config['process'].kill()
+                    self.signal_group(config['process'], signal.SIGKILL)
                     print(f"🔪 Force killed {name}")
                 except Exception as e:
                     print(f"❌ Error stopping {name}: {str(e)}")
 
-    def monitor_services(self):
-        """Monitor running services"""
+    def restart_delay(self, config: Dict) -> float:
+        """Exponential backoff: 1, 2, 4 ... 60 s; reset once a service has stayed up"""
+        if config['started_at'] and time.monotonic() - config['started_at'] >= STABLE_SECONDS:
+            config['failures'] = 0
+        delay = min(2 ** config['failures'], 60)
+        config['failures'] += 1
+        return delay
+
+    def monitor_services(self, interval: float = 1.0):
+        """Restart services that exit, with exponential backoff"""
         while self.running:
-            time.sleep(30)  # Check every 30 seconds
+            time.sleep(interval)
             
-            for name, config in self.services.items():
-                if config['process'] and config['process'].poll() is not None:
-                    print(f"⚠️  {name} has stopped unexpectedly!")
-                    # Optionally restart the service
-                    # self.start_service(name, config)
+            with self.lock:
+                if not self.running:
+                    break
+                now = time.monotonic()
+                for name, config in self.services.items():
+                    process = config['process']
+                    if config['restart_at'] is not None:
+                        if now >= config['restart_at']:
+                            config['restart_at'] = None
+                            config['restarts'] += 1
+                            print(f"🔁 Restarting {name} (restart #{config['restarts']})")
+                            self.start_service(name, config)
+                    elif process and process.poll() is not None:
+                        # Orphaned workers would keep the port and block the restart
+                        self.signal_group(process, signal.SIGKILL)
+                        delay = self.restart_delay(config)
+                        config['restart_at'] = now + delay
+                        print(f"⚠️  {name} exited with code {process.returncode}; restarting in {delay}s")
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
@@ -369,15 +580,24 @@ def signal_handler(sig, frame):
 def main():
     global manager
     
+    parser = argparse.ArgumentParser(description="Start and supervise every agent service")
+    parser.add_argument("--production", action="store_true", help="multiple uvicorn workers, no reloader")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "2")),
+                        help="uvicorn workers per service in production mode")
+    parser.add_argument("--monolith", action="store_true",
+                        help="run the retriever, analysis and language agents inside the orchestrator")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for readiness")
+    args = parser.parse_args()
+
     # Set up signal handling
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    manager = ServiceManager()
+    manager = ServiceManager(production=args.production, workers=args.workers, monolith=args.monolith)
     
     try:
         # Start all services
-        if manager.start_all_services():
+        if manager.start_all_services(timeout=args.timeout):
             print("\n🔄 Services are running. Press Ctrl+C to stop.")
             
             # Start monitoring in a separate thread
@@ -401,5 +621,7 @@ def main():
     
     return 0
 
-if __name__ == "__main__":
+# `streamlit run` also executes this file as __main__; only a plain
+# `python streamlit_app/app.py` launches the services
+if __name__ == "__main__" and not st.runtime.exists():
     sys.exit(main())
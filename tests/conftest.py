@@ -0,0 +1,73 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import threading
+import time
+import pytest
+
+
+class StubServer(ThreadingHTTPServer):
+    """Local stand-in for an upstream HTTP service.
+
+    Each GET is answered by handle(request) -> (status, body, headers), after
+    an optional delay. Requested paths, reply statuses and peak concurrency
+    are recorded for the test to inspect.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handle, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.handle = handle
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.paths = []
+        self.statuses = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.paths.append(urlparse(self.path))
+        try:
+            time.sleep(server.delay)
+            status, body, headers = server.handle(self)
+            with server.lock:
+                server.statuses.append(status)
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """Starts StubServers for the test and shuts them down afterwards"""
+    servers = []
+
+    def start(handle, delay: float = 0.0) -> StubServer:
+        server = StubServer(handle, delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
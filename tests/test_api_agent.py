@@ -0,0 +1,177 @@
+from urllib.parse import urlparse, parse_qs
+from fastapi.testclient import TestClient
+from agents import api_agent
+from common.rate_limit import TokenBucket
+from common.reference_cache import ReferenceDataCache
+import pandas as pd
+import json
+import time
+import pytest
+
+# Open and last close per ticker served by the fake bulk download
+PRICES = {"AAPL": (100.0, 102.0), "MSFT": (400.0, 396.0), "TSM": (150.0, 153.0)}
+OVERVIEWS = {
+    "AAPL": {"Sector": "TECHNOLOGY", "MarketCapitalization": "3400000000000"},
+    "MSFT": {"Sector": "TECHNOLOGY", "MarketCapitalization": "3100000000000"},
+    "TSM": {"Sector": "TECHNOLOGY", "MarketCapitalization": "800000000000"},
+    "NOPE": {"Sector": "ENERGY", "MarketCapitalization": "1000"},
+    "LIMIT": {"Note": "Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day."},
+}
+
+
+class AlphaVantage:
+    """OVERVIEW lookups from this test's own copy of OVERVIEWS; unknown symbols get a 500"""
+
+    def __init__(self):
+        self.overviews = dict(OVERVIEWS)
+
+    def __call__(self, request) -> tuple:
+        params = {key: values[0] for key, values in parse_qs(urlparse(request.path).query).items()}
+        overview = self.overviews.get(params.get("symbol")) if params.get("function") == "OVERVIEW" else None
+        if not overview:
+            return 500, b"{}", {"Content-Type": "application/json"}
+        return 200, json.dumps(overview).encode(), {"Content-Type": "application/json"}
+
+
+def symbols(server) -> list:
+    """Symbols the stub was asked for, in request order"""
+    return [parse_qs(path.query)["symbol"][0] for path in server.paths]
+
+
+class FakeDownload:
+    """yf.download stand-in: one row of (field, ticker) columns for the tickers it knows"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, tickers, **kwargs):
+        self.calls.append(list(tickers))
+        if self.fail:
+            raise ConnectionError("Yahoo Finance unavailable")
+        known = [ticker for ticker in tickers if ticker in PRICES]
+        columns = pd.MultiIndex.from_product([["Open", "Close"], known])
+        row = [PRICES[ticker][0] for ticker in known] + [PRICES[ticker][1] for ticker in known]
+        return pd.DataFrame([row], columns=columns, index=pd.DatetimeIndex(["2024-11-01"], name="Date"))
+
+
+@pytest.fixture
+def alpha(monkeypatch, stub_server):
+    server = stub_server(AlphaVantage(), delay=0.05)
+    monkeypatch.setattr(api_agent, "ALPHA_URL", server.url + "/query")
+    monkeypatch.setattr(api_agent, "ALPHA_KEY", "test-key")
+    monkeypatch.setattr(api_agent, "rate_limiter", TokenBucket(60000))
+    monkeypatch.setattr(api_agent, "overview_cache", ReferenceDataCache(
+        api_agent.load_overview, field_ttls={"sector": 3600, "market_cap": 3600}
+    ))
+    return server
+
+
+@pytest.fixture
+def download(monkeypatch):
+    download = FakeDownload()
+    monkeypatch.setattr(api_agent.yf, "download", download)
+    return download
+
+
+@pytest.fixture
+def client():
+    return TestClient(api_agent.app)
+
+
+def batch(client: TestClient, tickers: list) -> dict:
+    response = client.post("/market_data/batch", json={"tickers": tickers})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_one_bulk_download_for_all_tickers(alpha, download, client):
+    results = batch(client, ["aapl", "MSFT ", "AAPL", "TSM"])["results"]
+
+    assert download.calls == [["AAPL", "MSFT", "TSM"]]
+    assert list(results) == ["AAPL", "MSFT", "TSM"]
+    assert results["AAPL"]["current_price"] == 102.0
+    assert results["AAPL"]["change_pct"] == pytest.approx(2.0)
+    assert results["MSFT"]["change_pct"] == pytest.approx(-1.0)
+    assert results["TSM"]["sector"] == "TECHNOLOGY"
+    assert results["TSM"]["market_cap"] == "800000000000"
+    assert sorted(symbols(alpha)) == ["AAPL", "MSFT", "TSM"]
+
+
+def test_partial_failures_leave_other_tickers_intact(alpha, download, client):
+    # NOPE has no price, LIMIT is throttled, GONE is an Alpha Vantage error
+    results = batch(client, ["AAPL", "NOPE", "LIMIT", "GONE"])["results"]
+
+    assert results["AAPL"] == {
+        "ticker": "AAPL", "current_price": 102.0, "change_pct": pytest.approx(2.0),
+        "sector": "TECHNOLOGY", "market_cap": "3400000000000"
+    }
+    assert results["NOPE"]["current_price"] is None
+    assert results["NOPE"]["change_pct"] is None
+    assert results["NOPE"]["sector"] == "ENERGY"
+    for ticker in ("LIMIT", "GONE"):
+        assert results[ticker]["sector"] is None
+        assert results[ticker]["market_cap"] is None
+
+
+def test_failed_download_still_returns_overviews(alpha, monkeypatch, client):
+    download = FakeDownload(fail=True)
+    monkeypatch.setattr(api_agent.yf, "download", download)
+
+    results = batch(client, ["AAPL", "MSFT"])["results"]
+
+    assert len(download.calls) == 1
+    assert results["AAPL"]["current_price"] is None
+    assert results["AAPL"]["sector"] == "TECHNOLOGY"
+
+
+def test_overview_lookups_are_concurrent_and_bounded(alpha, download, client):
+    tickers = [f"T{i}" for i in range(3 * api_agent.ALPHA_MAX_WORKERS)]
+    alpha.handle.overviews.update({ticker: {"Sector": "INDUSTRIALS", "MarketCapitalization": "1"} for ticker in tickers})
+
+    start = time.perf_counter()
+    results = batch(client, tickers)["results"]
+    elapsed = time.perf_counter() - start
+
+    assert all(result["sector"] == "INDUSTRIALS" for result in results.values())
+    assert alpha.max_active == api_agent.ALPHA_MAX_WORKERS
+    # Sequential lookups would take len(tickers) * delay
+    assert elapsed < len(tickers) * alpha.delay
+
+
+def test_overviews_are_cached_between_batches(alpha, download, client):
+    batch(client, ["AAPL", "MSFT"])
+    batch(client, ["AAPL", "MSFT"])
+
+    assert sorted(symbols(alpha)) == ["AAPL", "MSFT"]
+    assert len(download.calls) == 2
+
+
+def test_rate_limited_lookups_do_not_wait_for_tokens(alpha, download, client, monkeypatch):
+    # One token up front, then one a second
+    monkeypatch.setattr(api_agent, "rate_limiter", TokenBucket(60, burst=1))
+    cache = api_agent.overview_cache
+
+    start = time.perf_counter()
+    first = batch(client, ["AAPL", "MSFT", "TSM"])["results"]
+    again = batch(client, ["AAPL", "MSFT", "TSM"])["results"]
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1
+    assert [result["sector"] for result in first.values()].count(None) == 2
+    assert again == first
+    # Throttled misses are served from the retry queue, not looked up again
+    assert len(symbols(alpha)) == 1
+    assert cache.stats()["deferred"] == 2
+
+    deadline = time.monotonic() + 5
+    while cache.stats()["refreshing"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    results = batch(client, ["AAPL", "MSFT", "TSM"])["results"]
+    assert all(result["sector"] == "TECHNOLOGY" for result in results.values())
+    assert sorted(symbols(alpha)) == ["AAPL", "MSFT", "TSM"]
+
+
+def test_empty_request(alpha, download, client):
+    assert batch(client, [" ", ""]) == {"results": {}}
+    assert download.calls == []
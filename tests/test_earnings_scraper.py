@@ -0,0 +1,102 @@
+from data_ingestion.earnings_scraper import EarningsScraper, parse_analysis_page
+import asyncio
+import hashlib
+import os
+import re
+import pytest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+PAGES = {"AAPL": "yahoo_analysis_aapl.html", "NEWC": "yahoo_analysis_newco.html"}
+
+
+def fixture_page(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def serve_page(request) -> tuple:
+    """Saved pages as /quote/<ticker>/analysis, with ETag revalidation"""
+    match = re.fullmatch(r"/quote/([A-Z0-9.^-]+)/analysis(\?.*)?", request.path)
+    ticker = match[1] if match else None
+    if ticker not in PAGES:
+        return 404, b"Not Found", {}
+    body = fixture_page(PAGES[ticker]).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+    if request.headers.get("If-None-Match") == etag:
+        return 304, b"", {"ETag": etag}
+    return 200, body, {"ETag": etag, "Content-Type": "text/html; charset=utf-8"}
+
+
+@pytest.fixture
+def server(stub_server):
+    return stub_server(serve_page)
+
+
+def test_parse_analysis_page_extracts_numeric_fields():
+    parsed = parse_analysis_page(fixture_page(PAGES["AAPL"]))
+
+    assert [quarter["period"] for quarter in parsed["quarters"]] == ["12/30/2023", "3/30/2024", "6/29/2024", "9/28/2024"]
+    assert parsed["latest"] == {
+        "period": "9/28/2024", "eps_estimate": 1.6, "eps_actual": 1.64, "difference": 0.04, "surprise_pct": 2.5
+    }
+    # Only the EPS table's Avg. Estimate row, not revenue's
+    assert parsed["avg_estimate"] == {
+        "Current Qtr. (Dec 2024)": 2.35, "Next Qtr. (Mar 2025)": 1.66,
+        "Current Year (2025)": 7.35, "Next Year (2026)": 8.25
+    }
+
+
+def test_parse_analysis_page_skips_unreported_quarters():
+    parsed = parse_analysis_page(fixture_page(PAGES["NEWC"]))
+
+    assert parsed["quarters"][1] == {
+        "period": "9/28/2024", "eps_estimate": -0.1, "eps_actual": None, "difference": None, "surprise_pct": None
+    }
+    assert parsed["latest"]["period"] == "6/29/2024"
+    assert parsed["latest"]["surprise_pct"] == 26.67
+    assert parsed["avg_estimate"]["Next Year (2026)"] is None
+
+
+def test_parse_analysis_page_without_tables():
+    assert parse_analysis_page("<html><body><p>No data</p></body></html>") == {
+        "quarters": [], "latest": None, "avg_estimate": {}
+    }
+
+
+def test_scrape_revalidates_with_etag(server, tmp_path):
+    cache_path = str(tmp_path / "earnings.json")
+
+    first = EarningsScraper(base_url=server.url, cache_path=cache_path)
+    results = asyncio.run(first.scrape(["AAPL", "NEWC"]))
+    assert results["AAPL"]["cached"] is False
+    assert results["AAPL"]["latest"]["eps_actual"] == 1.64
+    assert first.counters == {"fetched": 2, "not_modified": 0, "errors": 0}
+
+    # A new scraper picks the validators up from the cache file
+    second = EarningsScraper(base_url=server.url, cache_path=cache_path)
+    revalidated = asyncio.run(second.scrape(["AAPL", "NEWC"]))
+    assert server.statuses.count(304) == 2
+    assert second.counters == {"fetched": 0, "not_modified": 2, "errors": 0}
+    assert revalidated["AAPL"]["cached"] is True
+    assert {key: value for key, value in revalidated["AAPL"].items() if key != "cached"} == \
+        {key: value for key, value in results["AAPL"].items() if key != "cached"}
+
+
+def test_scrape_reports_errors_per_ticker(server):
+    scraper = EarningsScraper(base_url=server.url)
+    results = asyncio.run(scraper.scrape(["AAPL", "MISSING"]))
+
+    assert results["AAPL"]["latest"]["period"] == "9/28/2024"
+    assert results["MISSING"]["latest"] is None
+    assert "404" in results["MISSING"]["error"]
+    assert scraper.counters == {"fetched": 1, "not_modified": 0, "errors": 1}
+
+
+def test_scrape_bounds_concurrency(server):
+    server.delay = 0.05
+    scraper = EarningsScraper(base_url=server.url, max_concurrency=3)
+    results = asyncio.run(scraper.scrape(["AAPL", "NEWC"] * 6))
+
+    assert set(results) == {"AAPL", "NEWC"}
+    assert len(server.statuses) == 12
+    assert server.max_active == 3
@@ -0,0 +1,169 @@
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from agents import language_agent
+from common import ttl_cache
+from common.ttl_cache import TTLCache
+import pytest
+
+
+class FakeModel:
+    """Stands in for Gemini: answers from the prompt and counts calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        text = f"summary #{self.calls} of {len(prompt)} chars"
+        if stream:
+            return [SimpleNamespace(text=word + " ") for word in text.split()]
+        return SimpleNamespace(text=text)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(language_agent, "model", model)
+    return model
+
+
+@pytest.fixture
+def client():
+    return TestClient(language_agent.app)
+
+
+def use_cache(monkeypatch, **kwargs) -> TTLCache:
+    cache = TTLCache(**kwargs)
+    monkeypatch.setattr(language_agent, "summary_cache", cache)
+    return cache
+
+
+def summarize(client: TestClient, question: str, context: str = "Asia tech is 22% of AUM.", **extra):
+    return client.post("/generate_summary", json={"context": context, "question": question, **extra})
+
+
+def test_miss_then_hit(monkeypatch, clock, model, client):
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60)
+
+    first = summarize(client, "What is our risk exposure?")
+    second = summarize(client, "What is our risk exposure?")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["X-Cache-Key"] == first.headers["X-Cache-Key"]
+    assert second.json() == first.json()
+    assert model.calls == 1
+
+
+def test_fingerprint_ignores_whitespace_and_question_case(monkeypatch, clock, model, client):
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60)
+
+    summarize(client, "What is our  risk exposure?", context="Asia tech\nis 22% of AUM. ")
+    again = summarize(client, "what is our risk exposure?  ")
+
+    assert again.headers["X-Cache"] == "HIT"
+    assert model.calls == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch, clock, model, client):
+    cache = use_cache(monkeypatch, max_entries=8, ttl_seconds=60)
+
+    summarize(client, "Earnings surprises?")
+    clock.now += 59
+    assert summarize(client, "Earnings surprises?").headers["X-Cache"] == "HIT"
+    clock.now += 2
+    assert summarize(client, "Earnings surprises?").headers["X-Cache"] == "MISS"
+
+    assert model.calls == 2
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch, clock, model, client):
+    cache = use_cache(monkeypatch, max_entries=2, ttl_seconds=60)
+
+    summarize(client, "a?")
+    summarize(client, "b?")
+    assert summarize(client, "a?").headers["X-Cache"] == "HIT"
+    summarize(client, "c?")
+
+    assert summarize(client, "a?").headers["X-Cache"] == "HIT"
+    assert summarize(client, "b?").headers["X-Cache"] == "MISS"
+    assert cache.stats()["evictions"] == 2
+    assert model.calls == 4
+
+
+def test_sqlite_tier_survives_restart(monkeypatch, clock, model, client, tmp_path):
+    db_path = str(tmp_path / "summaries.db")
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60, db_path=db_path)
+    first = summarize(client, "Exposure by region?")
+
+    # A fresh cache on the same file stands in for a restarted agent
+    restarted = use_cache(monkeypatch, max_entries=8, ttl_seconds=60, db_path=db_path)
+    second = summarize(client, "Exposure by region?")
+
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert restarted.stats()["disk_hits"] == 1
+    assert model.calls == 1
+
+
+def test_sqlite_tier_does_not_serve_expired_entries(monkeypatch, clock, model, client, tmp_path):
+    db_path = str(tmp_path / "summaries.db")
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60, db_path=db_path)
+    summarize(client, "Exposure by region?")
+
+    clock.now += 61
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60, db_path=db_path)
+
+    assert summarize(client, "Exposure by region?").headers["X-Cache"] == "MISS"
+    assert model.calls == 2
+
+
+def test_cache_false_bypasses_lookup(monkeypatch, clock, model, client):
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60)
+
+    summarize(client, "Any surprises?")
+    fresh = summarize(client, "Any surprises?", cache=False)
+
+    assert fresh.headers["X-Cache"] == "MISS"
+    assert model.calls == 2
+
+
+def test_without_model_responses_bypass_cache(monkeypatch, clock, client):
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60)
+    monkeypatch.setattr(language_agent, "model", None)
+
+    response = summarize(client, "Any surprises?")
+
+    assert response.headers["X-Cache"] == "BYPASS"
+    assert "X-Cache-Key" not in response.headers
+
+
+def test_stream_fills_and_reads_the_same_cache(monkeypatch, clock, model, client):
+    use_cache(monkeypatch, max_entries=8, ttl_seconds=60)
+    body = {"context": "Asia tech is 22% of AUM.", "question": "Risk?"}
+
+    with client.stream("POST", "/generate_summary/stream", json=body) as streamed:
+        assert streamed.headers["X-Cache"] == "MISS"
+        events = streamed.read().decode()
+    assert "event: done" in events
+
+    assert summarize(client, "Risk?").headers["X-Cache"] == "HIT"
+    with client.stream("POST", "/generate_summary/stream", json=body) as streamed:
+        assert streamed.headers["X-Cache"] == "HIT"
+    assert model.calls == 1
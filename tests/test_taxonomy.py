@@ -0,0 +1,46 @@
+from agents.taxonomy import TaxonomyHolder
+import pytest
+
+MASTER = "ticker,name,aliases,region,country,sector\nTSM,Taiwan Semiconductor,TSMC,Asia,Taiwan,Technology\n"
+
+
+@pytest.fixture
+def holder(tmp_path):
+    master = tmp_path / "master" / "instrument_master.csv"
+    master.parent.mkdir()
+    master.write_text(MASTER)
+    holder = TaxonomyHolder(str(master))
+    holder.reload()
+    return holder
+
+
+def test_reload_from_a_file_next_to_the_master(holder, tmp_path):
+    (tmp_path / "master" / "next.csv").write_text(MASTER + "AAPL,Apple,,North America,United States,Technology\n")
+
+    loaded = holder.reload("next.csv")
+
+    assert holder.current is loaded
+    assert loaded.size == 2
+    assert holder.path == str(tmp_path / "master" / "next.csv")
+
+
+@pytest.mark.parametrize("path", ["../outside.csv", "/etc/passwd"])
+def test_reload_refuses_paths_outside_the_master_directory(holder, tmp_path, path):
+    (tmp_path / "outside.csv").write_text(MASTER)
+    live, source = holder.current, holder.path
+
+    with pytest.raises(PermissionError):
+        holder.reload(path)
+    assert holder.current is live
+    assert holder.path == source
+
+
+@pytest.mark.parametrize("content", ["ticker,name,sector\nTSM,Taiwan Semiconductor,Technology\n", "ticker,name,region,sector\n"])
+def test_invalid_master_keeps_the_live_index(holder, tmp_path, content):
+    (tmp_path / "master" / "bad.csv").write_text(content)
+    live, source = holder.current, holder.path
+
+    with pytest.raises(ValueError):
+        holder.reload("bad.csv")
+    assert holder.current is live
+    assert holder.path == source